@@ -0,0 +1,193 @@
+import curses
+import os
+import select
+import signal
+import sys
+import termios
+import threading
+import tty
+from time import perf_counter
+from typing import Optional
+
+import numpy as np
+
+from Core import *
+from Shared import *
+
+"""
+|---x--------->
+| 0 1 2 3 4 5 6
+y 1 2 3 4 5 6 7
+| 2 3 4 5 6 7 8
+v 3 4 5 6 7 8 9
+"""
+
+# Escape sequences of the keys we care about, mapped to curses' key codes.
+KeySequences = {
+    b"\x1b[A": curses.KEY_UP,
+    b"\x1b[B": curses.KEY_DOWN,
+    b"\x1b[C": curses.KEY_RIGHT,
+    b"\x1b[D": curses.KEY_LEFT,
+    b"\x1bOA": curses.KEY_UP,
+    b"\x1bOB": curses.KEY_DOWN,
+    b"\x1bOC": curses.KEY_RIGHT,
+    b"\x1bOD": curses.KEY_LEFT,
+}
+
+# Select Graphic Rendition of each Palette color
+ColorCodes = [b"\x1b[39m"] + [b"\x1b[%dm" % (30 + color) for color in range(1, len(Palette))]
+
+
+class AnsiCanvas(BufferCanvas):
+    pass
+
+
+class AnsiRender(IRender):
+    """
+    Talks to the terminal with raw ANSI escape sequences instead of curses.
+    Every changed run of a frame, cursor moves included, is encoded into one reused bytearray
+    and sent with a single os.write().
+    """
+
+    def __init__(self, out_fd: Optional[int] = None, in_fd: Optional[int] = None, gap: int = 3,
+                 escape_delay: float = 0.025):
+        """
+        :param escape_delay: seconds to wait for the rest of a key's escape sequence before it's taken as a lone ESC
+        """
+        self.OutFd = sys.stdout.fileno() if out_fd is None else out_fd
+        self.InFd = sys.stdin.fileno() if in_fd is None else in_fd
+        self.Gap = gap
+        self.CharMatrix: Optional[ndarray] = None
+        self.AttrMatrix: Optional[ndarray] = None
+        self.DirtyMarks: Optional[ndarray] = None
+        self.FrontMatrix: Optional[ndarray] = None
+        self.FrontAttrs: Optional[ndarray] = None
+        # The color the terminal is writing in, None when it's unknown
+        self.Pen: Optional[int] = None
+        self.ScreenLock = threading.RLock()
+        self.NeedRegen = True
+        self.width = 0
+        self.height = 0
+        self.Out = bytearray(1 << 16)
+        self.Writes = 0
+        self.BytesSent = 0
+        self.EscapeDelay = escape_delay
+        self._pending = b""
+        # When the pending bytes started to look like the beginning of a key's sequence
+        self._partial_since: Optional[float] = None
+        self._termios = None
+        self._resized = False
+
+    def Initialize(self):
+        try:
+            self._termios = termios.tcgetattr(self.InFd)
+            tty.setcbreak(self.InFd)
+        except termios.error:
+            self._termios = None
+        signal.signal(signal.SIGWINCH, self._on_winch)
+        # Alternate screen, hidden cursor
+        self.Write(b"\x1b[?1049h\x1b[?25l")
+
+    def _on_winch(self, signum, frame):
+        self._resized = True
+
+    def Allocate(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        size = height, width
+        self.CharMatrix = np.full(size, " ", dtype=str)
+        self.AttrMatrix = NewAttributes(height, width)
+        self.DirtyMarks = np.full((height,), False, dtype=bool)
+        self.FrontMatrix = np.full(size, " ", dtype=str)
+        self.FrontAttrs = NewAttributes(height, width)
+        self.Pen = None
+        self.NeedRegen = False
+
+    def OnResized(self):
+        self.NeedRegen = True
+
+    def CreateCanvas(self) -> AnsiCanvas:
+        if self.NeedRegen:
+            size = os.get_terminal_size(self.OutFd)
+            self.Allocate(size.columns, size.lines)
+            self.Write(b"\x1b[0m\x1b[2J")
+        return AnsiCanvas(self.width, self.height, self.CharMatrix, self.DirtyMarks, self.AttrMatrix)
+
+    def Render(self, canvas: Canvas):
+        if isinstance(canvas, AnsiCanvas):
+            dm = self.DirtyMarks
+            if not dm.any():
+                return
+            self.Flush(self.CharMatrix, self.AttrMatrix)
+            dm[:] = False
+
+    def Flush(self, frame: ndarray, attrs: ndarray):
+        """
+        The color is only switched when a run's differs from the previous one.
+        """
+        out = self.Out
+        n = 0
+        pen = self.Pen
+        for y, x, text, attr in DiffRuns(frame, self.FrontMatrix, attrs, self.FrontAttrs, self.Gap):
+            chunk = b"\x1b[%d;%dH" % (y + 1, x + 1)
+            if attr != pen:
+                chunk += ColorCodes[attr]
+                pen = attr
+            chunk += text.encode("utf-8")
+            end = n + len(chunk)
+            if end > len(out):
+                out.extend(bytes(max(end, len(out) * 2) - len(out)))
+            out[n:end] = chunk
+            n = end
+        if n > 0:
+            self.Write(memoryview(out)[:n])
+        self.Pen = pen
+        np.copyto(self.FrontMatrix, frame)
+        np.copyto(self.FrontAttrs, attrs)
+
+    def Write(self, data):
+        view = memoryview(data)
+        while len(view) > 0:
+            written = os.write(self.OutFd, view)
+            view = view[written:]
+            self.BytesSent += written
+        self.Writes += 1
+
+    def GetCh(self) -> Optional[int]:
+        """
+        Reads a pending key without blocking.
+        :return: curses' key code for arrows and resizing, the code point for others or None if there's none
+        """
+        if self._resized:
+            self._resized = False
+            return curses.KEY_RESIZE
+        pending = self._pending
+        if len(pending) < 3 and select.select([self.InFd], [], [], 0)[0]:
+            pending += os.read(self.InFd, 1024)
+        if not pending:
+            return None
+        if pending[0] == 0x1b:
+            for sequence, key in KeySequences.items():
+                if pending.startswith(sequence):
+                    self._pending = pending[len(sequence):]
+                    self._partial_since = None
+                    return key
+            if any(sequence.startswith(pending) for sequence in KeySequences):
+                # The rest of the sequence may come with the next read.
+                now = perf_counter()
+                if self._partial_since is None:
+                    self._partial_since = now
+                if now - self._partial_since < self.EscapeDelay:
+                    self._pending = pending
+                    return None
+        self._partial_since = None
+        # A lone byte, a multibyte UTF-8 char isn't a key we use anyway.
+        self._pending = pending[1:]
+        return pending[0]
+
+    def Dispose(self):
+        # Visible cursor, back to the main screen
+        self.Write(b"\x1b[0m\x1b[?25h\x1b[?1049l")
+        signal.signal(signal.SIGWINCH, signal.SIG_DFL)
+        if self._termios is not None:
+            termios.tcsetattr(self.InFd, termios.TCSADRAIN, self._termios)
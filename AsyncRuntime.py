@@ -0,0 +1,115 @@
+import asyncio
+from typing import Callable, Optional
+
+from Core import *
+from Games import Game
+from Inputs import DrainKeys
+from Profiler import PhaseProfiler
+
+
+class AsyncRuntime:
+    """
+    Runs a game on an asyncio event loop: input is a reader callback, ticks and frames are separate tasks.
+    Ticks keep a fixed timestep and catch up when they fall behind,
+    while frames which are already stale are dropped, so rendering never delays the simulation.
+    """
+
+    def __init__(self, game: Game, render: IRender, get_canvas: Callable[[], Canvas],
+                 getch: Callable[[], Optional[int]], on_key: Callable[[int], bool],
+                 tick_interval: float, frame_interval: float,
+                 input_fd: Optional[int] = None, profiler: Optional[PhaseProfiler] = None,
+                 max_catch_up: int = 5):
+        """
+        :param getch: returns the next pending key or None
+        :param on_key: handles a key, returns whether to quit
+        :param input_fd: the file descriptor to watch for input, keys are polled if it's None (Windows)
+        """
+        self.Game = game
+        self.Render = render
+        self.GetCanvas = get_canvas
+        self.Getch = getch
+        self.OnKey = on_key
+        self.TickInterval = tick_interval
+        self.FrameInterval = frame_interval
+        self.InputFd = input_fd
+        self.Profiler = profiler
+        self.MaxCatchUp = max_catch_up
+        self.FramesDropped = 0
+        self._stop: Optional[asyncio.Event] = None
+
+    def Run(self):
+        asyncio.run(self.Main())
+
+    async def Main(self):
+        loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        tasks = [asyncio.create_task(self.TickLoop()), asyncio.create_task(self.RenderLoop())]
+        fd = self.InputFd
+        if fd is not None:
+            loop.add_reader(fd, self.ReadKeys)
+        else:
+            tasks.append(asyncio.create_task(self.PollKeys()))
+        try:
+            await self._stop.wait()
+        finally:
+            if fd is not None:
+                loop.remove_reader(fd)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def ReadKeys(self):
+        if not self._stop.is_set() and DrainKeys(self.Getch, self.OnKey):
+            self._stop.set()
+
+    async def PollKeys(self, interval: float = 0.005):
+        while True:
+            self.ReadKeys()
+            await asyncio.sleep(interval)
+
+    async def TickLoop(self):
+        loop = asyncio.get_running_loop()
+        game = self.Game
+        interval = self.TickInterval
+        deadline = loop.time() + interval
+        while True:
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
+            now = loop.time()
+            due = int((now - deadline) // interval) + 1
+            if due > self.MaxCatchUp:
+                # Too far behind, resynchronize rather than fast-forwarding:
+                # the capped batch runs now and the next tick is due an interval later.
+                due = self.MaxCatchUp
+                deadline = now - (due - 1) * interval
+            profiler = self.Profiler
+            for i in range(due):
+                if profiler and profiler.Enabled:
+                    profiler.OnTick(int((now - deadline - i * interval) * 1e9))
+                game.Tick()
+            deadline += due * interval
+
+    async def RenderLoop(self):
+        loop = asyncio.get_running_loop()
+        game = self.Game
+        interval = self.FrameInterval
+        deadline = loop.time() + interval
+        while True:
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
+            profiler = self.Profiler
+            profiling = profiler is not None and profiler.Enabled
+            if game.NeedRender or profiling:
+                canvas = self.GetCanvas()
+                game.PaintOn(canvas)
+                if profiling:
+                    profiler.OnFrame()
+                    profiler.PaintOn(canvas)
+                    profiler.MaybeDump()
+                self.Render.Render(canvas)
+                game.ClearDirty()
+            now = loop.time()
+            deadline += interval
+            if deadline <= now:
+                # The frames we couldn't make in time are stale, skip to the next slot.
+                missed = int((now - deadline) // interval) + 1
+                self.FramesDropped += missed
+                deadline += missed * interval
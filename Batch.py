@@ -0,0 +1,144 @@
+"""
+Runs many independent headless games over a process pool:
+>`..\\Snake> python main.py batch --games 1000 --ticks 20000 --out results.csv`
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from Games import Game, Operation, Food, Direction, ContradictedDirections
+from Headless import Simulate, RandomPolicy, Policy, SimulationResult
+
+Tuning = Dict[str, object]
+
+DirectionOps: Dict[Direction, Operation] = {
+    Direction.Up: Operation.MoveUp,
+    Direction.Down: Operation.MoveDown,
+    Direction.Left: Operation.MoveLeft,
+    Direction.Right: Operation.MoveRight,
+}
+
+
+def GreedyPolicy(seed=None) -> Policy:
+    """
+    Heads for the nearest food, ties are broken randomly.
+    """
+    rand = random.Random(seed)
+
+    def policy(game: Game) -> Optional[Operation]:
+        snake = game.Snake
+        hx = snake.x
+        hy = snake.y
+        target = None
+        nearest = None
+        for obj in game.GameObjects:
+            if isinstance(obj, Food) and obj.IsActive:
+                distance = abs(obj.x - hx) + abs(obj.y - hy)
+                if nearest is None or distance < nearest:
+                    nearest = distance
+                    target = obj
+        store = game.FoodStore
+        if store is not None:
+            stored = store.Nearest(hx, hy)
+            if stored is not None and (nearest is None or abs(stored.x - hx) + abs(stored.y - hy) < nearest):
+                target = stored
+        if target is None:
+            return None
+        choices = []
+        if target.x < hx:
+            choices.append(Direction.Left)
+        elif target.x > hx:
+            choices.append(Direction.Right)
+        if target.y < hy:
+            choices.append(Direction.Up)
+        elif target.y > hy:
+            choices.append(Direction.Down)
+        choices = [d for d in choices if d != ContradictedDirections[snake.Direction]]
+        if not choices or snake.Direction in choices:
+            return None
+        return DirectionOps[rand.choice(choices)]
+
+    return policy
+
+
+Policies = {
+    "random": RandomPolicy,
+    "greedy": GreedyPolicy,
+}
+
+
+def ParseTiers(text: str) -> Tuple[Tuple[int, int], ...]:
+    """
+    "1:4,10:5,30:4" => ((1, 4), (10, 5), (30, 4))
+    """
+    tiers = []
+    for part in text.split(","):
+        limit, speed = part.split(":")
+        tiers.append((int(limit), int(speed)))
+    return tuple(tiers)
+
+
+def Tune(game: Game, tuning: Tuning):
+    fm = game.FoodManager
+    if tuning.get("bird") is not None:
+        fm.BirdChance = tuning["bird"]
+    if tuning.get("rate") is not None:
+        fm.RateChance = tuning["rate"]
+    if tuning.get("toad") is not None:
+        fm.ToadOdds = tuning["toad"]
+    if tuning.get("max_food") is not None:
+        fm.MaxFood = tuning["max_food"]
+    if tuning.get("tiers") is not None:
+        game.Snake.SpeedTiers = tuning["tiers"]
+
+
+def RunOne(job: Tuple[int, int, int, int, str, Tuning]) -> SimulationResult:
+    """
+    Runs in a worker process, so it only takes picklable arguments.
+    """
+    seed, width, height, ticks, policy, tuning = job
+    return Simulate(width, height, ticks, seed,
+                    policy=Policies[policy](seed),
+                    tune=lambda game: Tune(game, tuning),
+                    food_store=bool(tuning.get("food_store")))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py batch", description="Simulates many seeded games on all cores.")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--ticks", type=int, default=10000)
+    parser.add_argument("--width", type=int, default=80)
+    parser.add_argument("--height", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=0, help="the first game's seed, the others follow")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--policy", choices=sorted(Policies), default="random")
+    parser.add_argument("--bird", type=int, help="FoodManager.BirdChance")
+    parser.add_argument("--rate", type=int, help="FoodManager.RateChance")
+    parser.add_argument("--toad", type=int, help="FoodManager.ToadOdds")
+    parser.add_argument("--max-food", type=int, help="FoodManager.MaxFood")
+    parser.add_argument("--tiers", type=ParseTiers, help='Snake.SpeedTiers as "score:speed,...", e.g. "1:4,10:5,30:4"')
+    parser.add_argument("--food-store", action="store_true", help="keep food in a vectorized FoodStore")
+    parser.add_argument("--out", default="-", help="CSV results file, - for stdout")
+    args = parser.parse_args(argv)
+    tuning: Tuning = {"bird": args.bird, "rate": args.rate, "toad": args.toad, "tiers": args.tiers,
+                      "max_food": args.max_food, "food_store": args.food_store}
+    jobs = [(args.seed + i, args.width, args.height, args.ticks, args.policy, tuning) for i in range(args.games)]
+    chunksize = max(1, len(jobs) // (args.workers * 4))
+    out = sys.stdout if args.out == "-" else open(args.out, "w", newline="")
+    try:
+        writer = csv.writer(out)
+        writer.writerow(["seed", "score", "length", "ticks", "tps"])
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for result in pool.map(RunOne, jobs, chunksize=chunksize):
+                writer.writerow([result.seed, result.score, result.length, result.ticks, f"{result.tps:.0f}"])
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
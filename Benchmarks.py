@@ -0,0 +1,373 @@
+"""
+Times the hot paths of a frame against synthetic worlds:
+>`..\\Snake> python Benchmarks.py --out bench.json --plot bench.png`
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import tracemalloc
+from time import perf_counter_ns
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from events import event
+from Games import Game, BodyRing, Toad, Rate, Bird, Snake, FoodStore
+from Headless import NullRender
+from Shared import *
+
+Record = Dict[str, object]
+
+
+class FakeWindow:
+    """
+    Stands for a curses window, it only counts what would be sent to the terminal.
+    """
+
+    def __init__(self):
+        self.Calls = 0
+        self.Chars = 0
+        self.Frames = 0
+
+    def addstr(self, y: int, x: int, text: str, attr: int = 0):
+        self.Calls += 1
+        self.Chars += len(text)
+
+    def addnstr(self, y: int, x: int, text: str, n: int, attr: int = 0):
+        self.Calls += 1
+        self.Chars += min(len(text), n)
+
+    def refresh(self):
+        self.Frames += 1
+
+
+def Serpentine(width: int, height: int, number: int) -> List[Tuple[int, int]]:
+    """
+    Walks the board row by row, back and forth, wrapping around when it's full.
+    """
+    cells = width * height
+    path = []
+    for i in range(number):
+        k = i % cells
+        y = k // width
+        x = k % width
+        if y % 2 == 1:
+            x = width - 1 - x
+        path.append((x, y))
+    return path
+
+
+def ShapeSnake(snake: Snake, length: int):
+    board = snake.Board
+    snake.Leave()
+    path = Serpentine(board.Width, board.Height, length + 1)
+    head = snake.Head
+    head.x, head.y = path[0]
+    snake.x, snake.y = path[0]
+    snake.Bodies = BodyRing(path[1:])
+    snake.LastBodyPos = snake.Bodies.Tail
+    snake.Enter()
+
+
+def BuildWorld(width: int, height: int, length: int, foods: int, seed=0, store: bool = False) -> Game:
+    """
+    A game with a snake of the given length moving every tick and a fixed number of food.
+    Nothing new is spawned while it's measured.
+    :param store: whether the food lives in a FoodStore rather than in objects
+    """
+    game = Game(width, height, seed)
+    game.Initialize()
+    game.HandleTasks()
+    game.FoodManager.IsActive = False
+    snake = game.Snake
+    snake.SpeedTiers = ()
+    ShapeSnake(snake, length)
+    rand = game.Random
+    kinds = (Toad, Toad, Toad, Rate, Bird)
+    stored = {Toad: FoodStore.Toad, Rate: FoodStore.Rate, Bird: FoodStore.Bird}
+    if store:
+        game.UseFoodStore()
+    for _ in range(foods):
+        kind = rand.choice(kinds)
+        x = rand.randint(0, width - 1)
+        y = rand.randint(0, height - 1)
+        if store:
+            # The defaults of Rate's motivation, Bird's moveM and changeDireM
+            game.FoodStore.Spawn(stored[kind], x, y,
+                                 motivation=5 if kind is Bird else 10, change=20)
+        else:
+            food = kind(game, x, y)
+            food.Initialize()
+            game.AddGameObj(food)
+    game.HandleTasks()
+    return game
+
+
+def Measure(func: Callable[[], None], budget_ns: int = 200_000_000, max_runs: int = 1000) -> float:
+    """
+    :return: the mean nanoseconds per call
+    """
+    runs = 0
+    total = 0
+    while runs < max_runs and total < budget_ns:
+        start = perf_counter_ns()
+        func()
+        total += perf_counter_ns() - start
+        runs += 1
+    return total / runs
+
+
+def BenchWorld(width: int, height: int, length: int, foods: int) -> List[Record]:
+    import Linuxs
+    game = BuildWorld(width, height, length, foods)
+    render = NullRender(width, height)
+    canvas = render.CreateCanvas()
+    results: Dict[str, float] = {}
+    sent: Dict[str, FakeWindow] = {}
+
+    collide_ns = []
+    check_collide = game.CheckCollide
+
+    def timed_collide():
+        start = perf_counter_ns()
+        check_collide()
+        collide_ns.append(perf_counter_ns() - start)
+
+    game.CheckCollide = timed_collide
+    results["tick"] = Measure(game.Tick)
+    results["collide"] = sum(collide_ns) / len(collide_ns)
+    del game.CheckCollide
+
+    results["board_paint"] = Measure(lambda: game.Board.PaintOn(canvas))
+    results["snake_paint"] = Measure(lambda: game.Snake.PaintOn(canvas))
+
+    game.Invalidate()
+    game.PaintOn(canvas)
+
+    def delta_paint():
+        game.Tick()
+        game.PaintOn(canvas)
+
+    results["tick_delta_paint"] = Measure(delta_paint)
+
+    stored = BuildWorld(width, height, length, foods, store=True)
+    results["store_tick"] = Measure(stored.Tick)
+    stored_render = NullRender(width, height)
+    stored_canvas = stored_render.CreateCanvas()
+    stored.Invalidate()
+    stored.PaintOn(stored_canvas)
+
+    def store_delta_paint():
+        stored.Tick()
+        stored.PaintOn(stored_canvas)
+
+    results["store_tick_delta_paint"] = Measure(store_delta_paint)
+
+    def fake(cls):
+        r = cls()
+        r.width = width
+        r.height = height
+        r.CharMatrix = render.CharMatrix
+        r.AttrMatrix = render.AttrMatrix
+        r.DirtyMarks = render.DirtyMarks
+        r.Screen = FakeWindow()
+        return r
+
+    rows = fake(Linuxs.LinuxRender)
+    diff = fake(Linuxs.LinuxDiffRender)
+    diff.FrontMatrix = np.full(render.CharMatrix.shape, " ", dtype=str)
+    diff.FrontAttrs = NewAttributes(height, width)
+    linux_canvas = Linuxs.LinuxCanvas(width, height, render.CharMatrix, render.DirtyMarks, render.AttrMatrix)
+
+    def full_rows():
+        render.DirtyMarks[:] = True
+        rows.Render(linux_canvas)
+
+    results["render_rows_full"] = Measure(full_rows)
+    sent["render_rows_full"] = rows.Screen
+
+    diff_ns = []
+
+    def frame_diff():
+        game.Tick()
+        game.PaintOn(canvas)
+        start = perf_counter_ns()
+        diff.Render(linux_canvas)
+        diff_ns.append(perf_counter_ns() - start)
+
+    Measure(frame_diff)
+    results["render_diff_frame"] = sum(diff_ns) / len(diff_ns)
+    sent["render_diff_frame"] = diff.Screen
+
+    import os
+    import Ansis
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    ansi = Ansis.AnsiRender(out_fd=devnull, in_fd=devnull)
+    ansi.Allocate(width, height)
+    ansi_canvas = Ansis.AnsiCanvas(width, height, ansi.CharMatrix, ansi.DirtyMarks, ansi.AttrMatrix)
+    np.copyto(ansi.CharMatrix, render.CharMatrix)
+    np.copyto(ansi.AttrMatrix, render.AttrMatrix)
+    game.Invalidate()
+    ansi_ns = []
+
+    def frame_ansi():
+        game.Tick()
+        game.PaintOn(ansi_canvas)
+        start = perf_counter_ns()
+        ansi.Render(ansi_canvas)
+        ansi_ns.append(perf_counter_ns() - start)
+
+    frame_ansi()
+    ansi.Writes = 0
+    ansi.BytesSent = 0
+    ansi_ns.clear()
+    Measure(frame_ansi)
+    os.close(devnull)
+    results["render_ansi_frame"] = sum(ansi_ns) / len(ansi_ns)
+
+    records = []
+    for stage, ns in results.items():
+        record = {"stage": stage, "width": width, "height": height, "length": length, "foods": foods, "ns": ns}
+        if stage == "render_ansi_frame":
+            record["calls"] = ansi.Writes / len(ansi_ns)
+            record["bytes"] = ansi.BytesSent / len(ansi_ns)
+        if stage in sent:
+            window = sent[stage]
+            frames = len(diff_ns) if stage == "render_diff_frame" else window.Frames
+            record["calls"] = window.Calls / frames
+            record["chars"] = window.Chars / frames
+        records.append(record)
+    return records
+
+
+def BenchMemory(count: int) -> List[Record]:
+    """
+    Measures the bytes each kind of food takes, everything it allocates on construction included.
+    """
+    game = Game(80, 24, 0)
+    records = []
+    for kind in (Toad, Rate, Bird):
+        gc.collect()
+        tracemalloc.start()
+        units = [kind(game, i % 80, i % 24) for i in range(count)]
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        records.append({"stage": f"memory_{kind.__name__.lower()}", "count": count, "bytes": size / count})
+        del units
+    return records
+
+
+class Listener:
+    def __init__(self):
+        self.Calls = 0
+
+    def On(self, sender):
+        self.Calls += 1
+
+
+def BenchEvents(many: int = 16, calls: int = 100_000) -> List[Record]:
+    """
+    Times raising an event with no, one and many subscribers, half of them bound methods.
+    """
+    listeners = [Listener() for _ in range(many)]
+    records = []
+    for count in (0, 1, many):
+        e = event()
+        for i in range(count):
+            e.add(listeners[i].On if i % 2 == 0 else (lambda sender: None))
+        invoke = e.invoke
+        start = perf_counter_ns()
+        for _ in range(calls):
+            invoke(None)
+        ns = (perf_counter_ns() - start) / calls
+        records.append({"stage": f"event_invoke_{count}", "subscribers": count, "ns": ns})
+    return records
+
+
+def ParseSize(text: str) -> Tuple[int, int]:
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+
+def ParseInts(text: str) -> List[int]:
+    return [int(i) for i in text.split(",")]
+
+
+def Plot(records: List[Record], path: str):
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib isn't installed, skipped the plots", file=sys.stderr)
+        return
+    fig, axes = plt.subplots(1, 2, figsize=(12, 5))
+    for ax, sweep, key, label in ((axes[0], "length", "length", "snake length"),
+                                  (axes[1], "foods", "foods", "object count")):
+        chosen = [r for r in records if r["sweep"] == sweep]
+        for stage in sorted({r["stage"] for r in chosen}):
+            points = sorted((r[key], r["ns"] / 1000) for r in chosen if r["stage"] == stage)
+            ax.plot([p[0] for p in points], [p[1] for p in points], marker="o", label=stage)
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+        ax.set_xlabel(label)
+        ax.set_ylabel("µs per call")
+        ax.legend(fontsize="small")
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks tick, collision, paint and render.")
+    parser.add_argument("--sizes", default="80x24,200x60,1000x1000", help="board sizes swept with the base length and foods")
+    parser.add_argument("--size", type=ParseSize, default="200x60", help="the board for the length and food sweeps")
+    parser.add_argument("--lengths", type=ParseInts, default="10,100,1000,10000,100000")
+    parser.add_argument("--foods", type=ParseInts, default="0,10,100,1000")
+    parser.add_argument("--base-length", type=int, default=100)
+    parser.add_argument("--base-foods", type=int, default=100)
+    parser.add_argument("--memory-count", type=int, default=10000, help="how many units to measure bytes per unit with")
+    parser.add_argument("--out", default="-", help="JSON results file, - for stdout")
+    parser.add_argument("--plot", help="writes the scaling curves into this image, needs matplotlib")
+    args = parser.parse_args(argv)
+    records: List[Record] = []
+    width, height = args.size
+
+    def run(sweep: str, w: int, h: int, length: int, foods: int):
+        print(f"{sweep}: {w}x{h} length={length} foods={foods}", file=sys.stderr)
+        for record in BenchWorld(w, h, length, foods):
+            record["sweep"] = sweep
+            records.append(record)
+
+    for w, h in (ParseSize(s) for s in args.sizes.split(",")):
+        run("size", w, h, args.base_length, args.base_foods)
+    for length in args.lengths:
+        run("length", width, height, length, args.base_foods)
+    for foods in args.foods:
+        run("foods", width, height, args.base_length, foods)
+    for record in BenchMemory(args.memory_count):
+        record["sweep"] = "memory"
+        records.append(record)
+    for record in BenchEvents():
+        record["sweep"] = "events"
+        records.append(record)
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": records,
+    }
+    text = json.dumps(report, indent=1)
+    if args.out == "-":
+        print(text)
+    else:
+        with open(args.out, "w") as f:
+            f.write(text)
+    if args.plot:
+        Plot(records, args.plot)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import random
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+Cell = Tuple[int, int]
+
+"""
+|---x--------->
+| 0 1 2 3 4 5 6
+y 1 2 3 4 5 6 7
+| 2 3 4 5 6 7 8
+v 3 4 5 6 7 8 9
+"""
+
+
+class FreeCells:
+    """
+    Counts what stands on each cell and keeps the empty cells in a compacted list,
+    so drawing a random empty cell takes O(1).
+    An emptied cell is appended to the list, a filled one is swapped with the last and popped.
+    Cells are numbered y * width + x.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.Width = width
+        self.Height = height
+        cells = width * height
+        self.Counts: np.ndarray = np.zeros(cells, dtype=np.uint16)
+        # Free[:Length] are the empty cells
+        self.Free: np.ndarray = np.arange(cells, dtype=np.int32)
+        self.Length = cells
+        # Where each cell is in Free, -1 if it's occupied
+        self.Slots: np.ndarray = np.arange(cells, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return self.Length
+
+    def IsFree(self, x: int, y: int) -> bool:
+        return 0 <= x < self.Width and 0 <= y < self.Height and self.Counts[y * self.Width + x] == 0
+
+    def Indices(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """
+        :return: the numbers of the cells which are on the board
+        """
+        inside = (xs >= 0) & (xs < self.Width) & (ys >= 0) & (ys < self.Height)
+        return (ys[inside] * self.Width + xs[inside]).astype(np.int32)
+
+    def Occupy(self, x: int, y: int):
+        if 0 <= x < self.Width and 0 <= y < self.Height:
+            i = y * self.Width + x
+            counts = self.Counts
+            counts[i] += 1
+            if counts[i] == 1:
+                slots = self.Slots
+                free = self.Free
+                slot = int(slots[i])
+                self.Length -= 1
+                last = int(free[self.Length])
+                if last != i:
+                    free[slot] = last
+                    slots[last] = slot
+                slots[i] = -1
+
+    def Vacate(self, x: int, y: int):
+        if 0 <= x < self.Width and 0 <= y < self.Height:
+            i = y * self.Width + x
+            counts = self.Counts
+            if counts[i] == 0:
+                return
+            counts[i] -= 1
+            if counts[i] == 0:
+                self.Slots[i] = self.Length
+                self.Free[self.Length] = i
+                self.Length += 1
+
+    def OccupyMany(self, cells: np.ndarray):
+        """
+        Occupy() for each cell number, a cell may be repeated.
+        """
+        if len(cells) == 0:
+            return
+        counts = self.Counts
+        cells, times = np.unique(cells, return_counts=True)
+        before = counts[cells]
+        counts[cells] = before + times
+        filled = cells[before == 0]
+        if len(filled) == 0:
+            return
+        free = self.Free
+        slots = self.Slots
+        length = self.Length - len(filled)
+        # The filled cells leave holes before the new end, the cells still free after it move into them.
+        holes = slots[filled]
+        holes = holes[holes < length]
+        tail = free[length:self.Length]
+        movers = tail[counts[tail] == 0]
+        free[holes] = movers
+        slots[movers] = holes
+        slots[filled] = -1
+        self.Length = length
+
+    def VacateMany(self, cells: np.ndarray):
+        """
+        Vacate() for each cell number, a cell may be repeated but not more often than it's occupied.
+        """
+        if len(cells) == 0:
+            return
+        counts = self.Counts
+        cells, times = np.unique(cells, return_counts=True)
+        after = counts[cells] - times
+        counts[cells] = after
+        emptied = cells[after == 0]
+        end = self.Length + len(emptied)
+        self.Free[self.Length:end] = emptied
+        self.Slots[emptied] = np.arange(self.Length, end, dtype=np.int32)
+        self.Length = end
+
+    def Pick(self, rand: random.Random) -> Optional[Cell]:
+        """
+        :return: a random empty cell or None if the board is full
+        """
+        if self.Length == 0:
+            return None
+        i = int(self.Free[rand.randrange(self.Length)])
+        return i % self.Width, i // self.Width
+
+
+class OccupancyGrid:
+    """
+    A per-cell index of which units stand where.
+    Units register the cells they cover and update them incrementally as they move,
+    so a collision check only needs to look at the cells touched this tick.
+    A unit may cover the same cell more than once (e.g. a snake crossing itself).
+    """
+
+    def __init__(self, width: int, height: int):
+        self.Width = width
+        self.Height = height
+        self.Cells: List[List[Optional[List[Any]]]] = [[None] * width for _ in range(height)]
+        self.Touched: Dict[Any, List[Cell]] = {}
+        # Also counts what isn't a unit on the grid, e.g. FoodStore's food
+        self.Free = FreeCells(width, height)
+
+    def InBounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.Width and 0 <= y < self.Height
+
+    def At(self, x: int, y: int) -> List[Any]:
+        if 0 <= x < self.Width and 0 <= y < self.Height:
+            cell = self.Cells[y][x]
+            if cell:
+                return cell
+        return []
+
+    def Add(self, unit, x: int, y: int):
+        if 0 <= x < self.Width and 0 <= y < self.Height:
+            row = self.Cells[y]
+            cell = row[x]
+            if cell is None:
+                row[x] = [unit]
+            else:
+                cell.append(unit)
+            self.Free.Occupy(x, y)
+
+    def Discard(self, unit, x: int, y: int):
+        if 0 <= x < self.Width and 0 <= y < self.Height:
+            row = self.Cells[y]
+            cell = row[x]
+            if cell:
+                try:
+                    cell.remove(unit)
+                except ValueError:
+                    return
+                if not cell:
+                    row[x] = None
+                self.Free.Vacate(x, y)
+
+    def Touch(self, unit, x: int, y: int):
+        """
+        Marks a cell the unit has just entered, it'll be checked by the next Collide().
+        """
+        touched = self.Touched.get(unit)
+        if touched is None:
+            self.Touched[unit] = [(x, y)]
+        else:
+            touched.append((x, y))
+
+    def Place(self, unit, cells: Iterable[Cell]):
+        for x, y in cells:
+            self.Add(unit, x, y)
+            self.Touch(unit, x, y)
+
+    def Lift(self, unit, cells: Iterable[Cell]):
+        for x, y in cells:
+            self.Discard(unit, x, y)
+        self.Touched.pop(unit, None)
+
+    def Move(self, unit, old: Iterable[Cell], new: Iterable[Cell]):
+        for x, y in old:
+            self.Discard(unit, x, y)
+        self.Place(unit, new)
+
+    def Collide(self) -> List[Tuple[Any, Any]]:
+        """
+        Finds every pair of distinct units sharing a cell that was touched since the last call.
+        Each pair is reported once, the toucher first.
+        :return: [(unit, other)]
+        """
+        touched = self.Touched
+        if not touched:
+            return []
+        pairs = []
+        seen: Set[Tuple[int, int]] = set()
+        for unit, cells in touched.items():
+            uid = id(unit)
+            for x, y in cells:
+                for other in self.At(x, y):
+                    if other is unit:
+                        continue
+                    oid = id(other)
+                    key = (uid, oid) if uid < oid else (oid, uid)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    pairs.append((unit, other))
+        touched.clear()
+        return pairs
@@ -1,8 +1,56 @@
 from abc import ABC, abstractmethod
-from typing import Iterable, Optional
+from enum import IntEnum
+from typing import Any, Iterable, Optional, Sequence, Tuple, Union
+
+
+class Palette(IntEnum):
+    """
+    Foreground colors, the values match both curses' and ANSI's color numbers.
+    """
+    Default = 0
+    Red = 1
+    Green = 2
+    Yellow = 3
+    Blue = 4
+    Magenta = 5
+    Cyan = 6
+    White = 7
+
+
+# A rectangle of chars: one row as a str, a list of equally long rows or a 2-D `<U1` array
+Block = Union[str, Sequence[str], Any]
+
+
+def BlockSize(block: Block) -> Tuple[int, int]:
+    """
+    :return: (width, height)
+    """
+    if isinstance(block, str):
+        return len(block), 1
+    shape = getattr(block, "shape", None)
+    if shape is not None:
+        return (shape[0], 1) if len(shape) == 1 else (shape[1], shape[0])
+    return (len(block[0]) if len(block) > 0 else 0), len(block)
+
+
+def ClipBlock(block: Block, x1: int, x2: int, y1: int, y2: int) -> Block:
+    """
+    Cuts the part x1 <= x < x2, y1 <= y < y2 out of a block, arrays are sliced without copying.
+    """
+    if isinstance(block, str):
+        return block[x1:x2]
+    shape = getattr(block, "shape", None)
+    if shape is not None:
+        return block[x1:x2] if len(shape) == 1 else block[y1:y2, x1:x2]
+    return [row[x1:x2] for row in block[y1:y2]]
 
 
 class Canvas:
+    """
+    Char and Str write in the default color, call Color or Colors afterwards to recolor the cells.
+    """
+    __slots__ = ()
+
     @abstractmethod
     def Char(self, x: int, y: int, char: str):
         pass
@@ -11,12 +59,35 @@ class Canvas:
     def Str(self, x: int, y: int, string: Iterable[str]):
         pass
 
+    def Blit(self, x: int, y: int, block: Block):
+        """
+        Writes a rectangle of chars whose top-left corner is at (x, y), in the default color.
+        """
+        if isinstance(block, str):
+            self.Str(x, y, block)
+        else:
+            for j, row in enumerate(block):
+                self.Str(x, y + j, row)
+
+    def Points(self, xs, ys, char: str, color: Palette = Palette.Default):
+        """
+        Plots the same char at many cells.
+        :param xs: a NumPy array of x coordinates
+        :param ys: a NumPy array of y coordinates, as long as xs
+        """
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            self.Char(x, y, char)
+            self.Color(x, y, color)
+
     @abstractmethod
-    def Color(self, x: int, y: int, color):
+    def Color(self, x: int, y: int, color: Palette):
         pass
 
     @abstractmethod
-    def Colors(self, x1: int, x2: int, y1: int, y2: int, color):
+    def Colors(self, x1: int, x2: int, y1: int, y2: int, color: Palette):
+        """
+        Colors the rectangle x1 <= x < x2, y1 <= y < y2.
+        """
         pass
 
     @property
@@ -53,11 +124,14 @@ class IRender(ABC):
 
 
 class Painter:
+    __slots__ = ()
+
     def PaintOn(self, canvas: Canvas):
         pass
 
 
 class Viewer(Canvas):
+    __slots__ = ("X", "Y", "_width", "_height", "canvas")
 
     def __init__(self):
         self.X = 0
@@ -82,11 +156,45 @@ class Viewer(Canvas):
                 string = string[0:rest]
             canvas.Str(self.X + x, self.Y + y, string)
 
-    def Color(self, x: int, y: int, color):
-        pass
+    def Blit(self, x: int, y: int, block: Block):
+        canvas = self.canvas
+        if not canvas:
+            return
+        width, height = BlockSize(block)
+        # The part of the block inside this viewer, in the block's coordinates
+        x1 = max(0, -x)
+        y1 = max(0, -y)
+        x2 = min(width, self.Width - x)
+        y2 = min(height, self.Height - y)
+        if x1 < x2 and y1 < y2:
+            if x1 > 0 or y1 > 0 or x2 < width or y2 < height:
+                block = ClipBlock(block, x1, x2, y1, y2)
+            canvas.Blit(self.X + x + x1, self.Y + y + y1, block)
+
+    def Points(self, xs, ys, char: str, color: Palette = Palette.Default):
+        canvas = self.canvas
+        if canvas and len(xs) > 0:
+            inside = (xs >= 0) & (xs < self.Width) & (ys >= 0) & (ys < self.Height)
+            if not inside.all():
+                xs = xs[inside]
+                ys = ys[inside]
+            canvas.Points(xs + self.X, ys + self.Y, char, color)
+
+    def Color(self, x: int, y: int, color: Palette):
+        canvas = self.canvas
+        if canvas and 0 <= x < self.Width and 0 <= y < self.Height:
+            canvas.Color(self.X + x, self.Y + y, color)
 
-    def Colors(self, x1: int, x2: int, y1: int, y2: int, color):
-        pass
+    def Colors(self, x1: int, x2: int, y1: int, y2: int, color: Palette):
+        canvas = self.canvas
+        x1 = max(x1, 0)
+        y1 = max(y1, 0)
+        x2 = min(x2, self.Width)
+        y2 = min(y2, self.Height)
+        if canvas and x1 < x2 and y1 < y2:
+            X = self.X
+            Y = self.Y
+            canvas.Colors(X + x1, X + x2, Y + y1, Y + y2, color)
 
     @property
     def Width(self) -> int:
@@ -0,0 +1,125 @@
+from enum import IntEnum
+from typing import Any, Dict, List, Tuple
+
+from events import event
+
+# (sender, value)
+Record = Tuple[Any, int]
+
+
+class Notice(IntEnum):
+    # sender: the snake, value: the bonus; coalesced into the total bonus per snake
+    FoodEaten = 0
+    # sender: the removed unit; coalesced into one per unit
+    UnitRemoved = 1
+    # sender: the snake, value: its new score; coalesced into the last score per snake
+    ScoreChanged = 2
+
+
+class RingBuffer:
+    """
+    Records (sender, value) pairs into preallocated slots, it only grows if it's drained too late.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.Senders: List[Any] = [None] * capacity
+        self.Values: List[int] = [0] * capacity
+        self.Start = 0
+        self.Count = 0
+
+    def __len__(self) -> int:
+        return self.Count
+
+    def Append(self, sender, value: int):
+        capacity = len(self.Senders)
+        if self.Count == capacity:
+            self.Senders, self.Values = self.Snapshot(capacity * 2)
+            self.Start = 0
+            capacity *= 2
+        i = (self.Start + self.Count) % capacity
+        self.Senders[i] = sender
+        self.Values[i] = value
+        self.Count += 1
+
+    def Snapshot(self, capacity: int) -> Tuple[List[Any], List[int]]:
+        start = self.Start
+        end = start + self.Count
+        senders = self.Senders
+        values = self.Values
+        if end <= len(senders):
+            s = senders[start:end]
+            v = values[start:end]
+        else:
+            end -= len(senders)
+            s = senders[start:] + senders[:end]
+            v = values[start:] + values[:end]
+        pad = capacity - len(s)
+        return s + [None] * pad, v + [0] * pad
+
+    def Drain(self) -> List[Record]:
+        """
+        Takes every record out, the oldest first.
+        """
+        capacity = len(self.Senders)
+        senders = self.Senders
+        values = self.Values
+        records = []
+        i = self.Start
+        for _ in range(self.Count):
+            records.append((senders[i], values[i]))
+            # Don't keep what was sent alive.
+            senders[i] = None
+            i += 1
+            if i == capacity:
+                i = 0
+        self.Start = i
+        self.Count = 0
+        return records
+
+
+def Coalesce(notice: Notice, records: List[Record]) -> List[Record]:
+    """
+    Merges the records of the same sender, see Notice. The senders stay in order of their first record.
+    """
+    merged: Dict[Any, int] = {}
+    if notice == Notice.FoodEaten:
+        for sender, value in records:
+            merged[sender] = merged.get(sender, 0) + value
+    elif notice == Notice.ScoreChanged:
+        for sender, value in records:
+            merged[sender] = value
+    else:
+        for sender, value in records:
+            merged.setdefault(sender, value)
+    return list(merged.items())
+
+
+class EventBus:
+    """
+    Collects the game's notices during a tick and delivers them in one batch per kind once the tick is over,
+    so listeners never run inside the simulation.
+    A handler gets the bus and the coalesced records: handler(bus, [(sender, value)]).
+    Nothing is recorded for a notice nobody listens to.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.Buffers: List[RingBuffer] = [RingBuffer(capacity) for _ in Notice]
+        self.Events: List[event] = [event() for _ in Notice]
+
+    def On(self, notice: Notice) -> event:
+        """
+        :return: event(EventBus, List[Record])
+        """
+        return self.Events[notice]
+
+    def Post(self, notice: Notice, sender, value: int = 0):
+        if self.Events[notice].HasSubscribers:
+            self.Buffers[notice].Append(sender, value)
+
+    def Flush(self):
+        """
+        Delivers what was posted so far, what handlers post is delivered by the next Flush().
+        """
+        batches = [(notice, buffer.Drain()) for notice, buffer in zip(Notice, self.Buffers) if buffer.Count]
+        for notice, records in batches:
+            self.Events[notice](self, Coalesce(notice, records))
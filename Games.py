@@ -1,9 +1,15 @@
-from collections import deque, namedtuple
+from collections import namedtuple
 from enum import Enum, auto
-from typing import List, TypeVar, Deque, Iterator, Dict, Set, Any, Callable
+from typing import List, TypeVar, Iterator, Dict, Tuple
+
+import numpy as np
 
 import utils
+from Collisions import OccupancyGrid
 from Core import *
+from EventBus import EventBus, Notice
+from Inputs import TurnBuffer
+from Pools import Pool
 
 T = TypeVar("T")
 Array2D = List[List[Optional[T]]]
@@ -16,25 +22,44 @@ def Gen2DArray(row, column, init: T) -> Array2D:
 
 
 class Tickable:
+    # Units are numerous, slots keep them small. The events are only created once someone subscribes.
+    __slots__ = ("ticks", "GameManager", "_onRemoved", "_onAdded", "IsActive", "__weakref__")
+
     def __init__(self, game_manager: "Game"):
         self.ticks = 0
         self.GameManager: "Game" = game_manager
-        self._onRemoved = event()
-        self._onAdded = event()
+        self._onRemoved: Optional[event] = None
+        self._onAdded: Optional[event] = None
+        self.IsActive = True
+
+    def Reset(self, game_manager: "Game"):
+        """
+        Brings a pooled object back to the state it was constructed in.
+        """
+        self.ticks = 0
+        self.GameManager = game_manager
+        self._onRemoved = None
+        self._onAdded = None
         self.IsActive = True
 
     def Initialize(self):
         self.IsActive = True
         self.GameManager.AddTickable(self)
-        self.OnRemoved(self)
+        added = self._onAdded
+        if added is not None:
+            added(self)
 
     def Tick(self):
         self.ticks += 1
 
     def Destroy(self):
-        self.GameManager.Remove(self)
+        gm = self.GameManager
+        gm.Remove(self)
         self.IsActive = False
-        self.OnRemoved(self)
+        gm.Bus.Post(Notice.UnitRemoved, self)
+        removed = self._onRemoved
+        if removed is not None:
+            removed(self)
 
     @property
     def OnRemoved(self):
@@ -43,6 +68,8 @@ class Tickable:
 
         :return: event(Tickable)
         """
+        if self._onRemoved is None:
+            self._onRemoved = event()
         return self._onRemoved
 
     @property
@@ -52,14 +79,59 @@ class Tickable:
 
         :return: event(Tickable)
         """
+        if self._onAdded is None:
+            self._onAdded = event()
         return self._onAdded
 
 
 class GameUnit(Tickable, Painter):
+    __slots__ = ("x", "y", "Cells", "PaintedCells")
+    Color = Palette.Default
+
     def __init__(self, game_manager: "Game", x=0, y=0):
         super().__init__(game_manager)
         self.x = x
         self.y = y
+        self.Cells: Optional[List["Point"]] = None
+        self.PaintedCells: Optional[List["Point"]] = None
+
+    def Reset(self, game_manager: "Game", x=0, y=0):
+        super().Reset(game_manager)
+        self.x = x
+        self.y = y
+        self.Cells = None
+        self.PaintedCells = None
+
+    @property
+    def Footprint(self) -> Iterator["Point"]:
+        """
+        All cells this unit covers.
+        """
+        yield self.x, self.y
+
+    def Enter(self):
+        """
+        Registers this unit's footprint on the board's occupancy grid.
+        """
+        grid = self.GameManager.Board.Map
+        if self.Cells is not None:
+            grid.Lift(self, self.Cells)
+        self.Cells = list(self.Footprint)
+        grid.Place(self, self.Cells)
+
+    def Leave(self):
+        if self.Cells is not None:
+            self.GameManager.Board.Map.Lift(self, self.Cells)
+            self.Cells = None
+
+    def Relocate(self):
+        """
+        Call it after the position changed to keep the occupancy grid up to date.
+        """
+        if self.Cells is not None:
+            cells = list(self.Footprint)
+            self.GameManager.Board.Map.Move(self, self.Cells, cells)
+            self.Cells = cells
 
     def IsCollidedWith(self, obj: "GameUnit") -> bool:
         return obj.x == self.x and obj.y == self.y
@@ -67,33 +139,148 @@ class GameUnit(Tickable, Painter):
     def OnCollided(self, obj: "GameUnit"):
         pass
 
+    def PaintCell(self, canvas: Canvas, x: int, y: int):
+        """
+        Repaints one of the cells this unit covers.
+        """
+        self.PaintOn(canvas)
+
+    def PaintDelta(self, canvas: Canvas) -> List["Point"]:
+        """
+        Erases the cells painted last time which aren't covered anymore and paints the unit again.
+        :return: the erased cells
+        """
+        painted = self.PaintedCells
+        if self.IsActive:
+            cells = list(self.Footprint)
+            vacated = [cell for cell in painted if cell not in cells] if painted else []
+        else:
+            cells = None
+            vacated = painted or []
+        for x, y in vacated:
+            canvas.Char(x, y, " ")
+        if cells is not None:
+            self.PaintOn(canvas)
+        self.PaintedCells = cells
+        return vacated
+
+    def PaintSynced(self):
+        """
+        Called after a full repaint, the unit is on the canvas where it currently stands.
+        """
+        self.PaintedCells = list(self.Footprint)
+
 
 class Board(Tickable, Painter):
     def __init__(self, game_manager: "Game", width, height):
         super().__init__(game_manager)
         self.Width = width
         self.Height = height
-        self.Map = Gen2DArray(height, width, None)
+        self.Map = OccupancyGrid(width, height)
 
     def PaintOn(self, canvas: Canvas):
         w = min(self.Width, canvas.Width)
         h = min(self.Height, canvas.Height)
-        for j in range(h):
-            canvas.Str(0, j, utils.repeat(" ", w))
+        if w > 0 and h > 0:
+            canvas.Blit(0, 0, [utils.repeat(" ", w)] * h)
 
 
 class Body(GameUnit):
-    pass
+    __slots__ = ()
 
 
 class Head(Body):
-    pass
+    __slots__ = ()
 
 
 Point = namedtuple("Position", ["x", "y"])
 Vector = namedtuple("Vector", ["x", "y"])
 
 
+class BodyRing:
+    """
+    The snake's body segments as a ring buffer of coordinates, from the neck to the tail.
+    Moving takes O(1) without allocating: the neck steps back one slot and the tail's slot is dropped.
+    """
+
+    def __init__(self, points: Iterable[Point] = (), capacity: int = 16):
+        points = list(points)
+        capacity = max(capacity, len(points), 1)
+        self.Xs: np.ndarray = np.zeros(capacity, dtype=np.int32)
+        self.Ys: np.ndarray = np.zeros(capacity, dtype=np.int32)
+        self.Start = 0
+        self.Length = len(points)
+        for i, (x, y) in enumerate(points):
+            self.Xs[i] = x
+            self.Ys[i] = y
+
+    @property
+    def Capacity(self) -> int:
+        return len(self.Xs)
+
+    def __len__(self) -> int:
+        return self.Length
+
+    def __getitem__(self, index: int) -> Point:
+        length = self.Length
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError(index)
+        i = (self.Start + index) % self.Capacity
+        return Point(int(self.Xs[i]), int(self.Ys[i]))
+
+    def __iter__(self) -> Iterator[Point]:
+        xs, ys = self.Coords()
+        return map(Point, xs.tolist(), ys.tolist())
+
+    @property
+    def Tail(self) -> Point:
+        return self[-1]
+
+    def Coords(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: (xs, ys) from the neck to the tail, views unless the ring wraps around
+        """
+        start = self.Start
+        end = start + self.Length
+        capacity = self.Capacity
+        if end <= capacity:
+            return self.Xs[start:end], self.Ys[start:end]
+        end -= capacity
+        return (np.concatenate((self.Xs[start:], self.Xs[:end])),
+                np.concatenate((self.Ys[start:], self.Ys[:end])))
+
+    def Advance(self, x: int, y: int) -> Point:
+        """
+        Pushes a new neck and drops the tail.
+        :return: the dropped tail
+        """
+        tail = self.Tail
+        start = (self.Start - 1) % self.Capacity
+        self.Xs[start] = x
+        self.Ys[start] = y
+        self.Start = start
+        return tail
+
+    def Append(self, x: int, y: int):
+        """
+        Grows a new tail.
+        """
+        if self.Length == self.Capacity:
+            xs, ys = self.Coords()
+            capacity = self.Capacity * 2
+            self.Xs = np.zeros(capacity, dtype=np.int32)
+            self.Ys = np.zeros(capacity, dtype=np.int32)
+            self.Xs[:self.Length] = xs
+            self.Ys[:self.Length] = ys
+            self.Start = 0
+        i = (self.Start + self.Length) % self.Capacity
+        self.Xs[i] = x
+        self.Ys[i] = y
+        self.Length += 1
+
+
 class Direction(Enum):
     Up = Vector(0, -1)
     Down = Vector(0, 1)
@@ -124,40 +311,137 @@ ContradictedDirections: Dict[Direction, Direction] = {
 
 
 class FoodManager(Tickable):
+    """
+    Spawns food onto empty cells, drawn from the board's FreeCells,
+    as long as neither the food's own cap nor the total cap is reached.
+    """
 
     def __init__(self, game_manager: "Game"):
         super().__init__(game_manager)
+        # Out of 101 rolls
+        self.BirdChance = 5
+        self.RateChance = 10
+        # Otherwise a toad in 1 of this many
+        self.ToadOdds = 4
+        # How many of each kind may live at once, None for no cap
+        self.Caps: Dict[type, Optional[int]] = {Toad: 120, Rate: 40, Bird: 20}
+        self.MaxFood: Optional[int] = 150
+        # The living Food objects of each kind
+        self.Live: Dict[type, Dict["Food", None]] = {Toad: {}, Rate: {}, Bird: {}}
+        self.Pools: Dict[type, Pool] = {Toad: Pool(Toad), Rate: Pool(Rate), Bird: Pool(Bird)}
+        # (tick, food) of the removed food, waiting to go back to their pool
+        self.Retired: List[Tuple[int, "Food"]] = []
+        # Spawns into it instead of creating Food objects when it's set, see Game.UseFoodStore()
+        self.Store: Optional["FoodStore"] = None
+
+    def Population(self, kind: Optional[type] = None) -> int:
+        """
+        :param kind: Toad, Rate, Bird or None for all of them
+        """
+        store = self.Store
+        stored = store.Population() if store is not None else None
+        if kind is None:
+            total = sum(len(live) for live in self.Live.values())
+            return total + (int(stored.sum()) if stored is not None else 0)
+        count = len(self.Live[kind])
+        if stored is not None:
+            count += int(stored[StoreKinds[kind]])
+        return count
+
+    def CanSpawn(self, kind: type) -> bool:
+        cap = self.Caps.get(kind)
+        if cap is not None and self.Population(kind) >= cap:
+            return False
+        total = self.MaxFood
+        return total is None or self.Population() < total
+
+    def OnUnitsRemoved(self, bus: EventBus, records: List[Tuple["Tickable", int]]):
+        now = self.GameManager.Ticks
+        for unit, _ in records:
+            live = self.Live.get(type(unit))
+            if live is not None and unit in live:
+                del live[unit]
+                self.Retired.append((now, unit))
+
+    def Recycle(self):
+        """
+        Gives the removed food back to their pools, once the game let go of them:
+        they were removed in an earlier tick and their erasure isn't waiting to be painted.
+        """
+        gm = self.GameManager
+        now = gm.Ticks
+        queue = gm.PaintQueue
+        pools = self.Pools
+        waiting = []
+        for retired in self.Retired:
+            tick, food = retired
+            if tick < now and food not in queue:
+                pools[type(food)].Release(food)
+            else:
+                waiting.append(retired)
+        self.Retired = waiting
+
+    def PoolStats(self) -> Dict[str, Dict[str, int]]:
+        return {kind.__name__: pool.Stats() for kind, pool in self.Pools.items()}
 
     def Tick(self):
         super().Tick()
+        if self.Retired:
+            self.Recycle()
         if self.ticks % 2 == 1:
             gm = self.GameManager
-            xw = random.randint(0, gm.Width - 1)
-            xh = random.randint(0, gm.Height - 1)
+            rand = gm.Random
+            free = gm.Board.Map.Free
+            cell = free.Pick(rand)
             food = None
-            t = random.randint(0, 100)
-            if 0 <= t < 5:
-                mm = random.randint(1, 10)
-                cdm = random.randint(20, 100)
-                food = Bird(gm, xw, xh, changeDireM=cdm, moveM=mm)
-            elif t < 15:
-                rate_motivation = random.randint(1, 50)
-                food = Rate(gm, xw, xh, motivation=rate_motivation)
+            store = self.Store
+            t = rand.randint(0, 100)
+            bird_chance = self.BirdChance
+            if 0 <= t < bird_chance:
+                mm = rand.randint(1, 10)
+                cdm = rand.randint(20, 100)
+                kind = Bird
+            elif t < bird_chance + self.RateChance:
+                rate_motivation = rand.randint(1, 50)
+                kind = Rate
             else:
-                ok = random.randint(0, 3)
-                if ok == 0:
-                    food = Toad(gm, xw, xh)
+                ok = rand.randint(0, self.ToadOdds - 1)
+                kind = Toad if ok == 0 else None
+            if cell is None or kind is None or not self.CanSpawn(kind):
+                return
+            xw, xh = cell
+            if kind is Bird:
+                # Its wings need room too, unless they stick out of the board.
+                for wing in (xw + 1, xw + 2):
+                    if wing < gm.Width and not free.IsFree(wing, xh):
+                        return
+                if store is not None:
+                    store.Spawn(FoodStore.Bird, xw, xh, motivation=mm, change=cdm)
+                else:
+                    food = self.Pools[Bird].Acquire(gm, xw, xh, changeDireM=cdm, moveM=mm)
+            elif kind is Rate:
+                if store is not None:
+                    store.Spawn(FoodStore.Rate, xw, xh, motivation=rate_motivation)
+                else:
+                    food = self.Pools[Rate].Acquire(gm, xw, xh, motivation=rate_motivation)
+            elif store is not None:
+                store.Spawn(FoodStore.Toad, xw, xh)
+            else:
+                food = self.Pools[Toad].Acquire(gm, xw, xh)
             if food:
                 food.Initialize()
+                self.Live[kind][food] = None
                 gm.AddGameObj(food)
 
 
 class Food(GameUnit):
+    __slots__ = ("Bonus",)
+    # Painting never nests, so all food share one.
+    viewer = Viewer()
 
     def __init__(self, game_manager: "Game", bonus, x=0, y=0):
         super().__init__(game_manager, x, y)
         self.Bonus = bonus
-        self.viewer = Viewer()
 
     def OnEaten(self, snake: "Snake"):
         pass
@@ -167,13 +451,18 @@ class Food(GameUnit):
 
     def OnCollided(self, obj: "GameUnit"):
         if isinstance(obj, Snake):
-            if obj.Head.IsCollidedWith(self):
+            if self.IsCollidedWith(obj.Head):
                 obj.Score += self.Bonus
+                bus = self.GameManager.Bus
+                bus.Post(Notice.FoodEaten, obj, self.Bonus)
+                bus.Post(Notice.ScoreChanged, obj, obj.Score)
                 self.OnEaten(obj)
                 self.Destroy()
 
 
 class Toad(Food):
+    __slots__ = ()
+    Color = Palette.Yellow
 
     def __init__(self, game_manager: "Game", x=0, y=0):
         super().__init__(game_manager, 3, x, y)
@@ -186,17 +475,24 @@ class Toad(Food):
         v.Width = 1
         v.Height = 1
         v.Char(0, 0, "X")
+        v.Color(0, 0, self.Color)
 
     def OnEaten(self, snake: "Snake"):
         snake.AddBody()
 
 
 class Rate(Food):
+    __slots__ = ("Motivation",)
+    Color = Palette.Magenta
 
     def __init__(self, game_manager: "Game", x=0, y=0, motivation=10):
         super().__init__(game_manager, 5, x, y)
         self.Motivation = motivation
 
+    def Reset(self, game_manager: "Game", x=0, y=0, motivation=10):
+        super().Reset(game_manager, x, y)
+        self.Motivation = motivation
+
     def PaintOn(self, canvas: Canvas):
         v = self.viewer
         v.Bind(canvas)
@@ -205,12 +501,13 @@ class Rate(Food):
         v.Width = 1
         v.Height = 1
         v.Char(0, 0, "L")
+        v.Color(0, 0, self.Color)
 
     def Tick(self):
         super().Tick()
-        rt = random.randint(1, self.Motivation)
+        rt = self.GameManager.Random.randint(1, self.Motivation)
         if self.ticks % rt == 0:
-            dire = random.choice(AllDirections).value
+            dire = self.GameManager.Random.choice(AllDirections).value
             self.x += dire.x
             self.y += dire.y
             x = self.x
@@ -218,7 +515,8 @@ class Rate(Food):
             gm = self.GameManager
             if x < 0 or x > gm.Width or y < 0 or y > gm.Height:
                 self.Destroy()
-            self.GameManager.MarkDirty()
+            self.Relocate()
+            self.GameManager.MarkDirty(self)
 
     def OnEaten(self, snake: "Snake"):
         snake.AddBody()
@@ -229,6 +527,8 @@ class Bird(Food):
     """
     ^-^
     """
+    __slots__ = ("Direction", "ChangeDireM", "MoveM")
+    Color = Palette.Cyan
 
     def __init__(self, game_manager: "Game", x=0, y=0, changeDireM=20, moveM=5):
         super().__init__(game_manager, 10, x, y)
@@ -236,6 +536,12 @@ class Bird(Food):
         self.ChangeDireM = changeDireM
         self.MoveM = moveM
 
+    def Reset(self, game_manager: "Game", x=0, y=0, changeDireM=20, moveM=5):
+        super().Reset(game_manager, x, y)
+        self.Direction = Direction.Right.value
+        self.ChangeDireM = changeDireM
+        self.MoveM = moveM
+
     def PaintOn(self, canvas: Canvas):
         v = self.viewer
         v.Bind(canvas)
@@ -243,19 +549,27 @@ class Bird(Food):
         v.Y = self.y
         v.Width = 3
         v.Height = 1
-        v.Str(0, 0, "^-^")
+        v.Blit(0, 0, "^-^")
+        v.Colors(0, 3, 0, 1, self.Color)
+
+    def PaintCell(self, canvas: Canvas, x: int, y: int):
+        i = x - self.x
+        if 0 <= i < 3 and y == self.y:
+            canvas.Char(x, y, "^-^"[i])
+            canvas.Color(x, y, self.Color)
 
     def RandomDirection(self):
-        dx = random.randint(-1, 1)
-        dy = random.randint(-1, 1)
+        rand = self.GameManager.Random
+        dx = rand.randint(-1, 1)
+        dy = rand.randint(-1, 1)
         self.Direction = Vector(dx, dy)
 
     def Tick(self):
         super().Tick()
-        rt = random.randint(1, self.ChangeDireM)
+        rt = self.GameManager.Random.randint(1, self.ChangeDireM)
         if self.ticks % rt == 0:
             self.RandomDirection()
-        mt = random.randint(1, self.MoveM)
+        mt = self.GameManager.Random.randint(1, self.MoveM)
         if self.ticks % mt == 0:
             dire = self.Direction
             self.x += dire.x
@@ -265,7 +579,8 @@ class Bird(Food):
             gm = self.GameManager
             if x < 0 or x > gm.Width or y < 0 or y > gm.Height:
                 self.Destroy()
-            self.GameManager.MarkDirty()
+            self.Relocate()
+            self.GameManager.MarkDirty(self)
 
     def OnEaten(self, snake: "Snake"):
         snake.AddBody()
@@ -277,25 +592,312 @@ class Bird(Food):
         ox = obj.x
         return sx <= ox < sx + 3 and self.y == obj.y
 
+    @property
+    def Footprint(self) -> Iterator[Point]:
+        x = self.x
+        y = self.y
+        yield x, y
+        yield x + 1, y
+        yield x + 2, y
+
+
+class FoodStore(Tickable, Painter):
+    """
+    Keeps food as a struct of NumPy arrays instead of one object each, so thousands of them
+    tick, move, get culled and painted in a handful of array operations.
+    Toads, rates and birds behave like their Food classes, only their random draws come from a NumPy generator.
+    Entries are kept packed in [0, Count), removed ones are compacted away.
+    """
+    Toad = 0
+    Rate = 1
+    Bird = 2
+    # Indexed by kind
+    Bonuses = np.array([3, 5, 10], dtype=np.int32)
+    Growths = (1, 2, 3)
+    Widths = np.array([1, 1, 3], dtype=np.int32)
+    # A footprint cell's glyph: a toad, a rate, a bird's wing or a bird's body
+    Glyphs = ("X", "L", "^", "-")
+    GlyphColors = (Palette.Yellow, Palette.Magenta, Palette.Cyan, Palette.Cyan)
+    # Rates step into one of AllDirections
+    StepXs = np.array([d.value.x for d in AllDirections], dtype=np.int32)
+    StepYs = np.array([d.value.y for d in AllDirections], dtype=np.int32)
+
+    def __init__(self, game_manager: "Game", capacity: int = 64):
+        super().__init__(game_manager)
+        self.Count = 0
+        self.Rng = np.random.default_rng(game_manager.Random.getrandbits(64))
+        self.X = np.zeros(capacity, dtype=np.int32)
+        self.Y = np.zeros(capacity, dtype=np.int32)
+        self.Kind = np.zeros(capacity, dtype=np.int8)
+        self.Bonus = np.zeros(capacity, dtype=np.int32)
+        # A rate's motivation or a bird's moveM
+        self.Motivation = np.ones(capacity, dtype=np.int32)
+        # A bird's changeDireM
+        self.Change = np.ones(capacity, dtype=np.int32)
+        self.DX = np.zeros(capacity, dtype=np.int32)
+        self.DY = np.zeros(capacity, dtype=np.int32)
+        self.Ticks = np.zeros(capacity, dtype=np.int64)
+        # The footprint cells on the canvas: (xs, ys)
+        self.Painted: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        # Scratch marks of cells, food stays within x <= Width + 2 and y <= Height, see Tick()
+        self.Marks = np.zeros((game_manager.Height + 1, game_manager.Width + 3), dtype=bool)
+
+    @property
+    def Columns(self) -> Tuple[str, ...]:
+        return "X", "Y", "Kind", "Bonus", "Motivation", "Change", "DX", "DY", "Ticks"
+
+    def __len__(self) -> int:
+        return self.Count
+
+    def Spawn(self, kind: int, x: int, y: int, motivation: int = 1, change: int = 1):
+        """
+        :param motivation: a rate's motivation or a bird's moveM
+        :param change: a bird's changeDireM
+        """
+        i = self.Count
+        if i == len(self.X):
+            for name in self.Columns:
+                column = getattr(self, name)
+                grown = np.zeros(len(column) * 2, dtype=column.dtype)
+                grown[:i] = column
+                setattr(self, name, grown)
+        self.X[i] = x
+        self.Y[i] = y
+        self.Kind[i] = kind
+        self.Bonus[i] = self.Bonuses[kind]
+        self.Motivation[i] = motivation
+        self.Change[i] = change
+        # Birds start heading right like Bird does.
+        self.DX[i] = 1
+        self.DY[i] = 0
+        self.Ticks[i] = 0
+        self.Count = i + 1
+        self.Claim(np.array([i]), True)
+        self.GameManager.MarkDirty(self)
+
+    def Population(self) -> np.ndarray:
+        """
+        :return: how many of each kind there are
+        """
+        return np.bincount(self.Kind[:self.Count], minlength=len(self.Bonuses))
+
+    def Claim(self, indices: np.ndarray, taken: bool):
+        """
+        Registers the cells the entries cover with the board's FreeCells, or releases them.
+        """
+        free = self.GameManager.Board.Map.Free
+        xs = self.X[indices]
+        ys = self.Y[indices]
+        birds = self.Kind[indices] == self.Bird
+        if birds.any():
+            wxs = xs[birds]
+            wys = ys[birds]
+            xs = np.concatenate((xs, wxs + 1, wxs + 2))
+            ys = np.concatenate((ys, wys, wys))
+        cells = free.Indices(xs, ys)
+        if taken:
+            free.OccupyMany(cells)
+        else:
+            free.VacateMany(cells)
+
+    def Keep(self, keep: np.ndarray):
+        """
+        Compacts the entries, only those whose mask is True stay.
+        """
+        n = self.Count
+        kept = int(np.count_nonzero(keep))
+        if kept == n:
+            return
+        self.Claim(np.flatnonzero(~keep), False)
+        for name in self.Columns:
+            column = getattr(self, name)
+            column[:kept] = column[:n][keep]
+        self.Count = kept
+        self.GameManager.MarkDirty(self)
+
+    def Tick(self):
+        super().Tick()
+        n = self.Count
+        if n == 0:
+            return
+        rng = self.Rng
+        ticks = self.Ticks[:n]
+        ticks += 1
+        kind = self.Kind[:n]
+        dx = self.DX[:n]
+        dy = self.DY[:n]
+        moving = np.zeros(n, dtype=bool)
+        rates = np.flatnonzero(kind == self.Rate)
+        if len(rates) > 0:
+            rt = rng.integers(1, self.Motivation[rates] + 1)
+            steps = rates[ticks[rates] % rt == 0]
+            picks = rng.integers(0, len(AllDirections), size=len(steps))
+            dx[steps] = self.StepXs[picks]
+            dy[steps] = self.StepYs[picks]
+            moving[steps] = True
+        birds = np.flatnonzero(kind == self.Bird)
+        if len(birds) > 0:
+            rt = rng.integers(1, self.Change[birds] + 1)
+            turns = birds[ticks[birds] % rt == 0]
+            dx[turns] = rng.integers(-1, 2, size=len(turns))
+            dy[turns] = rng.integers(-1, 2, size=len(turns))
+            mt = rng.integers(1, self.Motivation[birds] + 1)
+            moving[birds[ticks[birds] % mt == 0]] = True
+        if not moving.any():
+            return
+        xs = self.X[:n]
+        ys = self.Y[:n]
+        moved = np.flatnonzero(moving)
+        self.Claim(moved, False)
+        xs[moved] += dx[moved]
+        ys[moved] += dy[moved]
+        self.Claim(moved, True)
+        self.GameManager.MarkDirty(self)
+        gm = self.GameManager
+        # The same bounds as Rate and Bird check
+        gone = moving & ((xs < 0) | (xs > gm.Width) | (ys < 0) | (ys > gm.Height))
+        if gone.any():
+            self.Keep(~gone)
+
+    def CheckCollide(self, snake: "Snake"):
+        """
+        Feeds the snake with everything under its head.
+        """
+        n = self.Count
+        if n == 0:
+            return
+        head = snake.Head
+        xs = self.X[:n]
+        eaten = (self.Y[:n] == head.y) & (xs <= head.x) & (head.x < xs + self.Widths[self.Kind[:n]])
+        if not eaten.any():
+            return
+        bus = self.GameManager.Bus
+        for i in np.flatnonzero(eaten).tolist():
+            bonus = int(self.Bonus[i])
+            snake.Score += bonus
+            bus.Post(Notice.FoodEaten, snake, bonus)
+            bus.Post(Notice.ScoreChanged, snake, snake.Score)
+            for _ in range(self.Growths[self.Kind[i]]):
+                snake.AddBody()
+        self.Keep(~eaten)
+
+    def Nearest(self, x: int, y: int) -> Optional[Point]:
+        n = self.Count
+        if n == 0:
+            return None
+        xs = self.X[:n]
+        ys = self.Y[:n]
+        i = int(np.argmin(np.abs(xs - x) + np.abs(ys - y)))
+        return Point(int(xs[i]), int(ys[i]))
+
+    def Covered(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        :return: (xs, ys, glyphs) of every cell covered, a bird covers three
+        """
+        n = self.Count
+        xs = self.X[:n]
+        ys = self.Y[:n]
+        kind = self.Kind[:n]
+        birds = kind == self.Bird
+        bxs = xs[birds]
+        bys = ys[birds]
+        wings = np.full(len(bxs), 2, dtype=np.int8)
+        return (np.concatenate((xs, bxs + 1, bxs + 2)),
+                np.concatenate((ys, bys, bys)),
+                np.concatenate((kind, wings + 1, wings)))
+
+    def Among(self, xs: np.ndarray, ys: np.ndarray, cxs: np.ndarray, cys: np.ndarray) -> np.ndarray:
+        """
+        :return: which of the cells (xs, ys) are among the cells (cxs, cys), found through the marks without sorting
+        """
+        marks = self.Marks
+        h, w = marks.shape
+        inside = (cxs >= 0) & (cxs < w) & (cys >= 0) & (cys < h)
+        cxs = cxs[inside]
+        cys = cys[inside]
+        marks[cys, cxs] = True
+        among = marks[ys, xs]
+        marks[cys, cxs] = False
+        return among
+
+    def Plot(self, canvas: Canvas, xs: np.ndarray, ys: np.ndarray, glyphs: np.ndarray):
+        for glyph, char in enumerate(self.Glyphs):
+            chosen = glyphs == glyph
+            if chosen.any():
+                canvas.Points(xs[chosen], ys[chosen], char, self.GlyphColors[glyph])
+
+    def PaintOn(self, canvas: Canvas):
+        xs, ys, glyphs = self.Covered()
+        self.Plot(canvas, xs, ys, glyphs)
+
+    def PaintCells(self, canvas: Canvas, cells: List[Point]):
+        """
+        Repaints the food standing on any of the cells.
+        """
+        if self.Count == 0 or not cells:
+            return
+        xs, ys, glyphs = self.Covered()
+        coords = np.array(cells, dtype=np.int32)
+        covered = self.Among(xs, ys, coords[:, 0], coords[:, 1])
+        if covered.any():
+            self.Plot(canvas, xs[covered], ys[covered], glyphs[covered])
+
+    def PaintDelta(self, canvas: Canvas) -> List[Point]:
+        xs, ys, glyphs = self.Covered()
+        painted = self.Painted
+        vacated = []
+        if painted is not None and len(painted[0]) > 0:
+            pxs, pys = painted
+            left = ~self.Among(pxs, pys, xs, ys)
+            if left.any():
+                vxs = pxs[left]
+                vys = pys[left]
+                canvas.Points(vxs, vys, " ")
+                vacated = list(zip(vxs.tolist(), vys.tolist()))
+        self.Plot(canvas, xs, ys, glyphs)
+        self.Painted = xs, ys
+        return vacated
+
+    def PaintSynced(self):
+        xs, ys, _ = self.Covered()
+        self.Painted = xs, ys
+
+
+StoreKinds: Dict[type, int] = {Toad: FoodStore.Toad, Rate: FoodStore.Rate, Bird: FoodStore.Bird}
+
 
 class Snake(GameUnit):
+    Color = Palette.Green
+    # (score below, ticks per move), the first matched tier wins.
+    # A fresh snake with no score has always moved every 4 ticks.
+    SpeedTiers: Tuple[Tuple[int, int], ...] = ((1, 4), (10, 5), (30, 4), (40, 3), (50, 2))
+    TopSpeed = 1
+
     def __init__(self, game_manager: "Game", board: Board, x: int, y: int, length: int):
         super().__init__(game_manager, x, y)
         self.Head: Head = Head(game_manager, x, y)
         self.Board: Board = board
-        self.Bodies: Deque[Body] = deque([Body(game_manager, x - i - 1, y) for i in range(length)])
+        self.Bodies: BodyRing = BodyRing([Point(x - i - 1, y) for i in range(length)])
         self._direction: Direction = Direction.Right
-        lastBody = self.Bodies[-1]
-        self.LastBodyPos: Point = lastBody.x, lastBody.y
+        self.LastBodyPos: Point = self.Bodies.Tail
         self.Score = 0
         self._speed = 5
         self.viewer = Viewer()
+        # What to draw since the last paint, in order: (x, y, char)
+        self.Strokes: List[Tuple[int, int, str]] = []
 
     @property
-    def AllParts(self) -> Iterator[Body]:
-        yield self.Head
-        for body in self.Bodies:
-            yield body
+    def AllParts(self) -> Iterator[Point]:
+        """
+        The positions of the head and every body segment.
+        """
+        head = self.Head
+        yield Point(head.x, head.y)
+        yield from self.Bodies
+
+    @property
+    def Footprint(self) -> Iterator[Point]:
+        return self.AllParts
 
     @property
     def HeadChar(self) -> str:
@@ -308,16 +910,49 @@ class Snake(GameUnit):
         v.Y = 0
         v.Width = canvas.Width
         v.Height = canvas.Height
-        for b in self.Bodies:
-            v.Char(b.x, b.y, "0")
+        color = self.Color
+        xs, ys = self.Bodies.Coords()
+        v.Points(xs, ys, "0", color)
         head = self.Head
         v.Char(head.x, head.y, self.HeadChar)
+        v.Color(head.x, head.y, color)
+
+    def PaintCell(self, canvas: Canvas, x: int, y: int):
+        head = self.Head
+        if head.x == x and head.y == y:
+            canvas.Char(x, y, self.HeadChar)
+        else:
+            canvas.Char(x, y, "0")
+        canvas.Color(x, y, self.Color)
+
+    def PaintDelta(self, canvas: Canvas) -> List[Point]:
+        vacated = []
+        if self.IsActive:
+            color = self.Color
+            for x, y, char in self.Strokes:
+                canvas.Char(x, y, char)
+                if char == " ":
+                    vacated.append((x, y))
+                else:
+                    canvas.Color(x, y, color)
+            head = self.Head
+            canvas.Char(head.x, head.y, self.HeadChar)
+            canvas.Color(head.x, head.y, color)
+        else:
+            for x, y in self.Footprint:
+                canvas.Char(x, y, " ")
+                vacated.append((x, y))
+        self.Strokes = []
+        return vacated
+
+    def PaintSynced(self):
+        self.Strokes = []
 
     def IsCollidedWith(self, obj: GameUnit) -> bool:
-        for body in self.AllParts:
-            if body.IsCollidedWith(obj):
-                return True
-        return False
+        if self.Head.IsCollidedWith(obj):
+            return True
+        xs, ys = self.Bodies.Coords()
+        return bool(np.any((xs == obj.x) & (ys == obj.y)))
 
     @property
     def Direction(self) -> Direction:
@@ -327,6 +962,7 @@ class Snake(GameUnit):
     def Direction(self, value: Direction):
         if self._direction != value and value != ContradictedDirections[self._direction]:
             self._direction = value
+            self.GameManager.MarkDirty(self)
 
     def Move(self):
         dx = self.Direction.value.x
@@ -350,34 +986,61 @@ class Snake(GameUnit):
 
         self.x = head.x
         self.y = head.y
-        tail = self.Bodies.pop()
-        newBody = Body(self.GameManager, ox, oy)
-        self.Bodies.appendleft(newBody)
-        lastBody = self.Bodies[-1]
-        self.LastBodyPos: Point = lastBody.x, lastBody.y
+        bodies = self.Bodies
+        tail = bodies.Advance(ox, oy)
+        self.LastBodyPos: Point = bodies.Tail
+        if not self.GameManager.FullPaint:
+            strokes = self.Strokes
+            strokes.append((tail.x, tail.y, " "))
+            strokes.append((ox, oy, "0"))
+        if self.Cells is not None:
+            # Only the head and the tail changed, the neck takes the head's old cell.
+            grid = self.Board.Map
+            grid.Discard(self, tail.x, tail.y)
+            grid.Add(self, head.x, head.y)
+            grid.Touch(self, head.x, head.y)
 
     def AddBody(self):
         x, y = self.LastBodyPos
-        newBody = Body(self.GameManager, x - 1, y)
-        self.Bodies.append(newBody)
+        x -= 1
+        self.Bodies.Append(x, y)
+        if not self.GameManager.FullPaint:
+            self.Strokes.append((x, y, "0"))
+        self.GameManager.MarkDirty(self)
+        if self.Cells is not None:
+            grid = self.Board.Map
+            grid.Add(self, x, y)
+            grid.Touch(self, x, y)
+
+    def Enter(self):
+        self.Leave()
+        self.Cells = []
+        self.Board.Map.Place(self, self.Footprint)
+
+    def Leave(self):
+        if self.Cells is not None:
+            self.Board.Map.Lift(self, self.Footprint)
+            self.Cells = None
+
+    def SpeedFor(self, score: int) -> int:
+        for limit, speed in self.SpeedTiers:
+            if score < limit:
+                return speed
+        return self.TopSpeed
+
+    def WillMove(self) -> bool:
+        """
+        Whether the next Tick() moves.
+        """
+        return (self.ticks + 1) % max(1, self.SpeedFor(self.Score)) == 0
 
     def Tick(self):
         super().Tick()
-        score = self.Score
-        if 0 < score < 10:
-            self.Speed = 5
-        elif score < 30:
-            self.Speed = 4
-        elif score < 40:
-            self.Speed = 3
-        elif score < 50:
-            self.Speed = 2
-        else:
-            self.Speed = 1
+        self.Speed = self.SpeedFor(self.Score)
 
         if self.ticks % self.Speed == 0:
             self.Move()
-            self.GameManager.MarkDirty()
+            self.GameManager.MarkDirty(self)
 
     @property
     def Speed(self) -> int:
@@ -395,24 +1058,62 @@ class Operation(Enum):
     MoveRight = auto()
 
 
+OperationDirections: Dict[Operation, Direction] = {
+    Operation.MoveUp: Direction.Up,
+    Operation.MoveDown: Direction.Down,
+    Operation.MoveLeft: Direction.Left,
+    Operation.MoveRight: Direction.Right,
+}
+
+
 class Game(Painter):
-    def __init__(self, width, height):
+    def __init__(self, width, height, seed=None):
+        """
+        :param seed: seeds the game's own random source, the same seed and operations replay the same game.
+        """
         self.Width = width
         self.Height = height
-        self.Tasks: Deque[Callable[[], None]] = deque()
+        self.Seed = seed
+        self.Random = random.Random(seed)
+        # Adding and removing is deferred to the end of the tick, see HandleTasks()
+        self.PendingUnits: List[GameUnit] = []
+        self.PendingTickables: List[Tickable] = []
+        self.PendingRemovals: List[Tickable] = []
         self.ticks = 0
         self.dirty = True
-        self.GameObjects: Set[GameUnit] = set()
-        self.TickableObjects: Set[Tickable] = set()
+        self.FullPaint = True
+        self.PaintQueue: Dict[GameUnit, None] = {}
+        # Dicts are used as insertion-ordered sets to keep the tick order deterministic.
+        self.GameObjects: Dict[GameUnit, None] = {}
+        self.TickableObjects: Dict[Tickable, None] = {}
         self.Board: Board = Board(self, width, height)
         self.Snake: Snake = Snake(self, self.Board, width // 2, height // 2, 7)
-        self.OperationQueue: Deque[Operation] = deque()
+        # Turns waiting for the snake's next moves
+        self.Turns = TurnBuffer(ContradictedDirections)
+        self.FoodStore: Optional[FoodStore] = None
+        # Notices posted during a tick are delivered after it, see Tick()
+        self.Bus = EventBus()
+        # Sees every operation and every tick, see Replays.ReplayRecorder
+        self.Recorder = None
         self.Snake.Initialize()
 
     def Initialize(self):
         self.AddGameObj(self.Snake)
         self.AddTickable(self.Board)
-        self.AddTickable(FoodManager(self))
+        self.FoodManager = FoodManager(self)
+        self.AddTickable(self.FoodManager)
+        self.Bus.On(Notice.UnitRemoved).add(self.FoodManager.OnUnitsRemoved)
+
+    def UseFoodStore(self) -> FoodStore:
+        """
+        Makes FoodManager spawn new food into a FoodStore, call it after Initialize().
+        """
+        if self.FoodStore is None:
+            store = FoodStore(self)
+            self.FoodStore = store
+            self.FoodManager.Store = store
+            self.AddTickable(store)
+        return self.FoodStore
 
     def Tick(self):
         self.ticks += 1
@@ -422,94 +1123,143 @@ class Game(Painter):
                 obj.Tick()
         self.CheckCollide()
         self.HandleTasks()
+        self.Bus.Flush()
+        if self.Recorder is not None:
+            self.Recorder.OnTick(self)
 
     def HandleTasks(self):
-        tasks = self.Tasks
-        while len(tasks) > 0:
-            task = tasks.popleft()
-            task()
+        """
+        Applies the pending additions, then the pending removals, each kind in one batch.
+        """
+        while self.PendingUnits or self.PendingTickables or self.PendingRemovals:
+            units = self.PendingUnits
+            tickables = self.PendingTickables
+            removals = self.PendingRemovals
+            self.PendingUnits = []
+            self.PendingTickables = []
+            self.PendingRemovals = []
+            if units:
+                added = dict.fromkeys(units)
+                self.GameObjects.update(added)
+                self.TickableObjects.update(added)
+                for obj in units:
+                    obj.GameManager = self
+                    obj.Enter()
+                    self.MarkDirty(obj)
+            if tickables:
+                self.TickableObjects.update(dict.fromkeys(tickables))
+                for obj in tickables:
+                    obj.GameManager = self
+                self.MarkDirty()
+            if removals:
+                game_objects = self.GameObjects
+                tickable_objects = self.TickableObjects
+                for obj in removals:
+                    obj.IsActive = False
+                    tickable_objects.pop(obj, None)
+                    if obj in game_objects:
+                        del game_objects[obj]
+                        obj.Leave()
+                        self.MarkDirty(obj)
+                self.MarkDirty()
 
     def CheckCollide(self):
-        allobjs = list(self.GameObjects)
-        number = len(allobjs)
-        max_index = number - 1
-        for i in range(number):
-            if i == max_index:
-                break
-            obj = allobjs[i]
-            if not obj.IsActive:
-                continue
-            for j in range(i + 1, number):
-                target = allobjs[j]
-                if not target.IsActive:
-                    continue
-                if obj.IsCollidedWith(target) or target.IsCollidedWith(obj):
-                    obj.OnCollided(target)
-                    target.OnCollided(obj)
+        """
+        Only the cells entered since the last tick are checked, see OccupancyGrid.
+        """
+        for obj, target in self.Board.Map.Collide():
+            if obj.IsActive and target.IsActive:
+                obj.OnCollided(target)
+                target.OnCollided(obj)
+        store = self.FoodStore
+        if store is not None and self.Snake.IsActive:
+            store.CheckCollide(self.Snake)
 
     @property
     def Ticks(self) -> int:
         return self.ticks
 
     def HandleOp(self):
-        queue = self.OperationQueue
+        """
+        Turns the snake with the oldest buffered turn, only when it's about to move, so each move takes one turn.
+        """
+        turns = self.Turns
         snake = self.Snake
-        if len(queue) > 0:
-            op = queue.pop()
-            if op == Operation.MoveUp:
-                snake.Direction = Direction.Up
-            elif op == Operation.MoveDown:
-                snake.Direction = Direction.Down
-            elif op == Operation.MoveLeft:
-                snake.Direction = Direction.Left
-            elif op == Operation.MoveRight:
-                snake.Direction = Direction.Right
+        if len(turns) > 0 and snake.WillMove():
+            snake.Direction = turns.Next(self.ticks)
 
     def AddOp(self, op: Operation):
-        self.OperationQueue.append(op)
+        if self.Recorder is not None:
+            self.Recorder.OnOp(self, op)
+        self.Turns.Push(OperationDirections[op], self.Snake.Direction, self.ticks)
 
     def PaintOn(self, canvas: Canvas):
+        """
+        Repaints everything after Invalidate(), otherwise only the units marked dirty since the last paint.
+        """
+        queue = self.PaintQueue
+        if self.FullPaint:
+            self.PaintAll(canvas)
+            for obj in self.GameObjects:
+                if obj.IsActive:
+                    obj.PaintSynced()
+            store = self.FoodStore
+            if store is not None:
+                store.PaintSynced()
+            queue.clear()
+            self.FullPaint = False
+            return
+        vacated = []
+        for obj in queue:
+            vacated.extend(obj.PaintDelta(canvas))
+        queue.clear()
+        # Something else may still stand on an erased cell.
+        grid = self.Board.Map
+        for x, y in vacated:
+            for occupant in grid.At(x, y):
+                if occupant.IsActive:
+                    occupant.PaintCell(canvas, x, y)
+        store = self.FoodStore
+        if store is not None:
+            store.PaintCells(canvas, vacated)
+
+    def PaintAll(self, canvas: Canvas):
+        """
+        Paints the whole game, but leaves what the next PaintOn() repaints alone.
+        """
         self.Board.PaintOn(canvas)
         for obj in self.GameObjects:
             if obj.IsActive:
                 obj.PaintOn(canvas)
+        store = self.FoodStore
+        if store is not None:
+            store.PaintOn(canvas)
 
     @property
     def NeedRender(self) -> bool:
         return self.dirty
 
-    def MarkDirty(self):
+    def Invalidate(self):
+        """
+        Makes the next PaintOn() repaint the whole canvas, e.g. after it was resized.
+        """
+        self.FullPaint = True
+        self.dirty = True
+
+    def MarkDirty(self, obj: Optional[GameUnit] = None):
         self.dirty = True
+        # A pending full repaint covers it anyway.
+        if obj is not None and not self.FullPaint:
+            self.PaintQueue[obj] = None
 
     def ClearDirty(self):
         self.dirty = False
 
     def AddGameObj(self, obj: GameUnit):
-        def func():
-            self.GameObjects.add(obj)
-            self.TickableObjects.add(obj)
-            obj.GameManager = self
-            self.MarkDirty()
-
-        self.Tasks.append(func)
+        self.PendingUnits.append(obj)
 
     def AddTickable(self, obj: Tickable):
-        def func():
-            self.TickableObjects.add(obj)
-            obj.GameManager = self
-            self.MarkDirty()
-
-        self.Tasks.append(func)
-
-    def Remove(self, obj: Any):
-        def func():
-            if isinstance(obj, GameUnit):
-                obj.IsActive = False
-                self.GameObjects.remove(obj)
-                self.TickableObjects.remove(obj)
-            elif isinstance(obj, Tickable):
-                obj.IsActive = False
-                self.TickableObjects.remove(obj)
-            self.MarkDirty()
-
-        self.Tasks.append(func)
+        self.PendingTickables.append(obj)
+
+    def Remove(self, obj: Tickable):
+        self.PendingRemovals.append(obj)
@@ -0,0 +1,121 @@
+import argparse
+import random
+from collections import namedtuple
+from time import perf_counter
+from typing import Callable, Optional
+
+import numpy as np
+
+from Core import *
+from Games import Game, Operation
+from Replays import ReplayRecorder
+from Shared import *
+
+Policy = Callable[[Game], Optional[Operation]]
+
+SimulationResult = namedtuple("SimulationResult", ["seed", "ticks", "score", "length", "seconds", "tps"])
+
+
+class NullRender(IRender):
+    """
+    Renders nowhere, the frame only lives in its NumPy buffer.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.CharMatrix: ndarray = np.full((height, width), " ", dtype=str)
+        self.AttrMatrix: ndarray = NewAttributes(height, width)
+        self.DirtyMarks: ndarray = np.full((height,), False, dtype=bool)
+
+    def Initialize(self):
+        pass
+
+    def OnResized(self):
+        pass
+
+    def CreateCanvas(self) -> BufferCanvas:
+        return BufferCanvas(self.width, self.height, self.CharMatrix, self.DirtyMarks, self.AttrMatrix)
+
+    def Render(self, canvas: Canvas):
+        self.DirtyMarks[:] = False
+
+    def Dispose(self):
+        pass
+
+
+def RandomPolicy(seed=None, turn_chance: float = 0.1) -> Policy:
+    """
+    Turns into a random direction now and then.
+    """
+    rand = random.Random(seed)
+    ops = list(Operation)
+
+    def policy(game: Game) -> Optional[Operation]:
+        if rand.random() < turn_chance:
+            return rand.choice(ops)
+        return None
+
+    return policy
+
+
+def Simulate(width: int, height: int, ticks: int, seed=None,
+             policy: Optional[Policy] = None, paint: bool = False,
+             tune: Optional[Callable[[Game], None]] = None, food_store: bool = False,
+             record: Optional[str] = None) -> SimulationResult:
+    """
+    Steps a game as fast as possible, without any timer.
+    :param paint: whether to paint and render every tick into a NullRender
+    :param food_store: whether new food goes into a vectorized FoodStore
+    :param tune: adjusts the game, e.g. FoodManager's chances, after it was initialized
+    :param record: saves a replay of the game into this file, see Replays
+    """
+    game = Game(width, height, seed)
+    render = NullRender(width, height)
+    canvas = render.CreateCanvas()
+    game.Initialize()
+    if food_store:
+        game.UseFoodStore()
+    if tune:
+        tune(game)
+    recorder = ReplayRecorder(game) if record else None
+    start = perf_counter()
+    for _ in range(ticks):
+        if policy:
+            op = policy(game)
+            if op is not None:
+                game.AddOp(op)
+        game.Tick()
+        if paint and game.NeedRender:
+            game.PaintOn(canvas)
+            render.Render(canvas)
+            game.ClearDirty()
+    seconds = perf_counter() - start
+    if recorder:
+        recorder.Save(record)
+    snake = game.Snake
+    return SimulationResult(
+        seed=seed, ticks=game.Ticks, score=snake.Score, length=len(snake.Bodies) + 1,
+        seconds=seconds, tps=game.Ticks / seconds if seconds > 0 else float("inf")
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs a game without any terminal.")
+    parser.add_argument("--width", type=int, default=80)
+    parser.add_argument("--height", type=int, default=24)
+    parser.add_argument("--ticks", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--paint", action="store_true", help="paint every tick as well")
+    parser.add_argument("--food-store", action="store_true", help="keep food in a vectorized FoodStore")
+    parser.add_argument("--record", help="saves a replay of the game into this file")
+    args = parser.parse_args(argv)
+    result = Simulate(args.width, args.height, args.ticks, args.seed,
+                      policy=RandomPolicy(args.seed), paint=args.paint, food_store=args.food_store,
+                      record=args.record)
+    print(f"seed={result.seed} ticks={result.ticks} score={result.score} length={result.length} "
+          f"time={result.seconds:.3f}s {result.tps:.0f} ticks/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+from collections import deque
+from time import perf_counter_ns
+from typing import Callable, Deque, Dict, Hashable, Optional, Tuple
+
+from Profiler import RollingSamples
+
+# (direction, when it was pushed in ns, the game tick it was pushed at)
+Turn = Tuple[Hashable, int, int]
+
+
+def DrainKeys(getch: Callable[[], Optional[int]], on_key: Callable[[int], bool]) -> bool:
+    """
+    Handles every pending key, not just one per poll.
+    :param getch: returns the next pending key or None
+    :param on_key: handles a key, returns whether to quit
+    :return: whether to quit
+    """
+    while True:
+        ch_num = getch()
+        if ch_num is None:
+            return False
+        if on_key(ch_num):
+            return True
+
+
+class TurnBuffer:
+    """
+    Buffers a few turns and hands them out one per move, so quick successive turns aren't lost
+    while key-repeat floods can't pile up.
+    A turn which doesn't change the heading it would apply to, or reverses it, is dropped as it's pushed.
+    """
+
+    def __init__(self, contradicted: Dict[Hashable, Hashable], capacity: int = 3,
+                 clock: Callable[[], int] = perf_counter_ns, samples: int = 512):
+        """
+        :param contradicted: the opposite of each direction
+        :param clock: nanoseconds for the latency stats
+        """
+        self.Contradicted = contradicted
+        self.Capacity = capacity
+        self.Clock = clock
+        self.Turns: Deque[Turn] = deque()
+        # From pushing a turn to the move it's applied to
+        self.Latencies = RollingSamples(samples)
+        self.TickLatencies = RollingSamples(samples)
+        self.Coalesced = 0
+        self.Dropped = 0
+
+    def __len__(self) -> int:
+        return len(self.Turns)
+
+    def Push(self, direction, heading, tick: int) -> bool:
+        """
+        :param heading: the direction the snake heads to now
+        :return: whether the turn was buffered
+        """
+        turns = self.Turns
+        last = turns[-1][0] if turns else heading
+        if direction == last or direction == self.Contradicted[last]:
+            self.Coalesced += 1
+            return False
+        if len(turns) >= self.Capacity:
+            self.Dropped += 1
+            return False
+        turns.append((direction, self.Clock(), tick))
+        return True
+
+    def Next(self, tick: int):
+        """
+        Takes the oldest turn out, call it when the snake is about to move.
+        :return: its direction or None if there's none
+        """
+        turns = self.Turns
+        if not turns:
+            return None
+        direction, pushed, pushed_tick = turns.popleft()
+        self.Latencies.Add(self.Clock() - pushed)
+        self.TickLatencies.Add(tick - pushed_tick)
+        return direction
+
+    def Clear(self):
+        self.Turns.clear()
+
+    def Stats(self) -> Dict[str, float]:
+        """
+        :return: the p50/p95/p99 latency in ms and in ticks, how many turns were coalesced and dropped
+        """
+        p50, p95, p99 = self.Latencies.Percentiles(50, 95, 99)
+        t50, t95, t99 = self.TickLatencies.Percentiles(50, 95, 99)
+        return {"p50": p50 / 1e6, "p95": p95 / 1e6, "p99": p99 / 1e6,
+                "ticks_p50": t50, "ticks_p95": t95, "ticks_p99": t99,
+                "applied": self.Latencies.Count, "coalesced": self.Coalesced, "dropped": self.Dropped}
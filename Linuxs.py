@@ -1,12 +1,11 @@
 import curses
 import os
+import threading
 from curses import window
 from typing import Optional, Tuple
-from typing import Iterable
 
 import numpy as np
 
-import utils
 from Core import *
 from Shared import *
 
@@ -23,51 +22,21 @@ def GetWinsize() -> Tuple[int, int]:
     return os.get_terminal_size()
 
 
-class LinuxCanvas(Canvas):
-    def __init__(self, width: int, height: int, buffer: Buffer, dirty_marks: DirtyMarks):
-        self._width = width
-        self._height = height
-        self.buffer: Buffer = buffer
-        self.dirty_marks: DirtyMarks = dirty_marks
-
-    @property
-    def Width(self):
-        return self._width
-
-    @property
-    def Height(self):
-        return self._height
-
-    def Char(self, x, y, char: str):
-        if 0 <= x < self.Width and 0 <= y < self.Height:
-            self.buffer[y, x] = char
-            self.dirty_marks[y] = True
-
-    def Str(self, x, y, string: Iterable[str]):
-        width = self.Width
-        height = self.Height
-        buffer = self.buffer
-        marks = self.dirty_marks
-        for i, char in enumerate(string):
-            nx = x + i
-            if 0 <= nx < width and 0 <= y < height:
-                buffer[y, nx] = char
-        if 0 <= y < height:
-            marks[y] = True
-
-    def Color(self, x: int, y: int, color):
-        pass
-
-    def Colors(self, x1: int, x2: int, y1: int, y2: int, color):
-        pass
+class LinuxCanvas(BufferCanvas):
+    pass
 
 
 class LinuxRender(IRender):
 
     def __init__(self):
         self.CharMatrix: Optional[ndarray] = None
+        self.AttrMatrix: Optional[ndarray] = None
         self.DirtyMarks: Optional[ndarray] = None
+        # Curses attributes of each Palette color, all plain when the terminal has no colors
+        self.ColorPairs = [0] * len(Palette)
         self.Screen: Optional[window] = None
+        # Curses isn't thread-safe, whoever touches the screen from another thread holds it.
+        self.ScreenLock = threading.RLock()
         self.NeedRegen = True
         self.width: int = 0
         self.height: int = 0
@@ -80,18 +49,34 @@ class LinuxRender(IRender):
         scr.keypad(True)
         scr.nodelay(True)
         scr.clear()
+        self.InitColors()
         size = GetWinsize()
         print(size)
         self.width = size.columns
         self.height = size.lines
         size = self.height, self.width
         heights = self.height,
-        if not self.CharMatrix or self.CharMatrix.shape != size:
+        if self.CharMatrix is None or self.CharMatrix.shape != size:
             self.CharMatrix = np.full(size, " ", dtype=str)
-        if not self.DirtyMarks or self.DirtyMarks.shape != heights:
+            self.AttrMatrix = NewAttributes(*size)
+        if self.DirtyMarks is None or self.DirtyMarks.shape != heights:
             self.DirtyMarks = np.full(heights, False, dtype=bool)
         self.NeedRegen = False
 
+    def InitColors(self):
+        if not curses.has_colors():
+            return
+        try:
+            curses.start_color()
+            curses.use_default_colors()
+            background = -1
+        except curses.error:
+            background = curses.COLOR_BLACK
+        for color in Palette:
+            if color != Palette.Default:
+                curses.init_pair(color, color, background)
+                self.ColorPairs[color] = curses.color_pair(color)
+
     def OnResized(self):
         self.NeedRegen = True
 
@@ -101,22 +86,69 @@ class LinuxRender(IRender):
     def CreateCanvas(self) -> LinuxCanvas:
         if self.NeedRegen:
             self.RegenScreen()
-        return LinuxCanvas(self.width, self.height, self.CharMatrix, self.DirtyMarks)
+        return LinuxCanvas(self.width, self.height, self.CharMatrix, self.DirtyMarks, self.AttrMatrix)
 
     def Render(self, canvas: Canvas):
         if isinstance(canvas, LinuxCanvas):
             cm = self.CharMatrix
+            am = self.AttrMatrix
+            pairs = self.ColorPairs
             screen = self.Screen
             dm = self.DirtyMarks
-            for i, dirty in enumerate(dm):
-                if dirty:
-                    line = utils.chain(Iterate2DRow(cm, i))
-                    try:
-                        screen.addstr(i, 0, line)
-                    except:
-                        pass
-                    dm[i] = False
+            rows = RowsOf(cm)
+            for i in np.flatnonzero(dm).tolist():
+                row = str(rows[i])
+                try:
+                    for start, end, attr in AttributeRuns(am[i]):
+                        screen.addstr(i, start, row[start:end], pairs[attr])
+                except:
+                    pass
+            dm[:] = False
             screen.refresh()
 
     def Dispose(self):
         curses.endwin()
+
+
+class LinuxDiffRender(LinuxRender):
+    """
+    Double-buffered, it keeps the last flushed frame and only sends the runs of cells which changed.
+    """
+
+    def __init__(self, gap: int = 3):
+        super().__init__()
+        self.FrontMatrix: Optional[ndarray] = None
+        self.FrontAttrs: Optional[ndarray] = None
+        self.Gap = gap
+
+    def RegenScreen(self):
+        super().RegenScreen()
+        # The screen was just cleared.
+        self.FrontMatrix = np.full(self.CharMatrix.shape, " ", dtype=str)
+        self.FrontAttrs = NewAttributes(*self.CharMatrix.shape)
+
+    def Render(self, canvas: Canvas):
+        if isinstance(canvas, LinuxCanvas):
+            dm = self.DirtyMarks
+            if not dm.any():
+                return
+            self.Flush(self.CharMatrix, self.AttrMatrix)
+            dm[:] = False
+
+    def Flush(self, frame: ndarray, attrs: ndarray):
+        """
+        Sends what differs between the frame and the screen, one call per run of a color.
+        """
+        front = self.FrontMatrix
+        front_attrs = self.FrontAttrs
+        pairs = self.ColorPairs
+        screen = self.Screen
+        for y, x, text, attr in DiffRuns(frame, front, attrs, front_attrs, self.Gap):
+            try:
+                screen.addnstr(y, x, text, len(text), pairs[attr])
+            except curses.error:
+                # Writing the bottom-right cell moves the cursor off the screen.
+                pass
+        np.copyto(front, frame)
+        np.copyto(front_attrs, attrs)
+        screen.refresh()
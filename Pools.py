@@ -0,0 +1,43 @@
+from typing import Callable, Dict, Generic, List, TypeVar
+
+T = TypeVar("T")
+
+
+class Pool(Generic[T]):
+    """
+    Keeps released objects around to hand them out again instead of allocating new ones.
+    A reused object is reset with the arguments it's acquired with, so its Reset() must take the same ones as its
+    constructor.
+    """
+
+    def __init__(self, factory: Callable[..., T], limit: int = 1024):
+        """
+        :param factory: builds a new object when none is free, usually the class
+        :param limit: how many free objects to keep at most
+        """
+        self.Factory = factory
+        self.Limit = limit
+        self.Free: List[T] = []
+        self.Allocated = 0
+        self.Reused = 0
+        self.Live = 0
+
+    def Acquire(self, *args, **kwargs) -> T:
+        free = self.Free
+        if free:
+            obj = free.pop()
+            obj.Reset(*args, **kwargs)
+            self.Reused += 1
+        else:
+            obj = self.Factory(*args, **kwargs)
+            self.Allocated += 1
+        self.Live += 1
+        return obj
+
+    def Release(self, obj: T):
+        self.Live -= 1
+        if len(self.Free) < self.Limit:
+            self.Free.append(obj)
+
+    def Stats(self) -> Dict[str, int]:
+        return {"allocated": self.Allocated, "reused": self.Reused, "live": self.Live, "free": len(self.Free)}
@@ -0,0 +1,184 @@
+import csv
+import json
+from time import perf_counter, perf_counter_ns
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import utils
+from Core import *
+
+# (object, method name, phase)
+HookSpec = Tuple[Any, str, str]
+
+
+class RollingSamples:
+    """
+    Keeps the latest samples in a ring, the percentiles are only computed on demand.
+    """
+
+    def __init__(self, capacity: int):
+        self.Samples: List[int] = [0] * capacity
+        self.Capacity = capacity
+        self.Count = 0
+
+    def Add(self, value: int):
+        self.Samples[self.Count % self.Capacity] = value
+        self.Count += 1
+
+    def Percentiles(self, *qs: float) -> List[float]:
+        filled = min(self.Count, self.Capacity)
+        if filled == 0:
+            return [0.0 for _ in qs]
+        return np.percentile(np.array(self.Samples[:filled]), qs).tolist()
+
+
+class PhaseProfiler(Painter):
+    """
+    Times the phases of the main loop by wrapping the hooked methods of their objects.
+    Nothing is wrapped while it's disabled, so it costs nothing then.
+    """
+    Phases = ("Tick", "HandleOp", "CheckCollide", "HandleTasks", "PaintOn", "Render", "InputLatency")
+
+    def __init__(self, tick_interval: float, frame_interval: float, capacity: int = 512,
+                 dump_path: Optional[str] = None, dump_every: float = 5.0):
+        """
+        :param tick_interval: seconds between two logic ticks
+        :param frame_interval: seconds between two rendered frames
+        :param dump_path: where to dump the stats periodically, *.csv or *.json
+        """
+        self.TickInterval = int(tick_interval * 1e9)
+        self.FrameInterval = int(frame_interval * 1e9)
+        self.Capacity = capacity
+        self.Samples: Dict[str, RollingSamples] = {}
+        self.Hooks: List[HookSpec] = []
+        self.Enabled = False
+        # Whether it was ever enabled, watched samples come in even while it's off.
+        self.WasEnabled = False
+        self.FramesDropped = 0
+        self.TicksLate = 0
+        self.LastFrame: Optional[int] = None
+        self.DumpPath = dump_path
+        self.DumpEvery = dump_every
+        self.LastDump = perf_counter()
+        self.viewer = Viewer()
+
+    def Hook(self, obj, method: str, phase: Optional[str] = None) -> "PhaseProfiler":
+        """
+        Registers a method to time as a phase, it's wrapped once the profiler is enabled.
+        """
+        self.Hooks.append((obj, method, phase or method))
+        if self.Enabled:
+            self._wrap(obj, method, phase or method)
+        return self
+
+    def Enable(self):
+        if not self.Enabled:
+            for obj, method, phase in self.Hooks:
+                self._wrap(obj, method, phase)
+            self.LastFrame = None
+            self.Enabled = True
+            self.WasEnabled = True
+
+    def Disable(self):
+        if self.Enabled:
+            for obj, method, phase in self.Hooks:
+                # Removing the instance attribute uncovers the class's method again.
+                obj.__dict__.pop(method, None)
+            self.Enabled = False
+
+    def Toggle(self):
+        if self.Enabled:
+            self.Disable()
+        else:
+            self.Enable()
+
+    def _wrap(self, obj, method: str, phase: str):
+        func = getattr(obj, method)
+        record = self.Record
+
+        def timed(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(phase, perf_counter_ns() - start)
+
+        setattr(obj, method, timed)
+
+    def Watch(self, phase: str, samples: RollingSamples):
+        """
+        Reports samples collected elsewhere, e.g. TurnBuffer's latencies, as a phase.
+        """
+        self.Samples[phase] = samples
+
+    def Record(self, phase: str, ns: int):
+        samples = self.Samples.get(phase)
+        if samples is None:
+            samples = RollingSamples(self.Capacity)
+            self.Samples[phase] = samples
+        samples.Add(ns)
+
+    def OnTick(self, late_ns: int):
+        """
+        :param late_ns: how long after its deadline the tick started
+        """
+        self.Record("TickLate", late_ns)
+        if late_ns >= self.TickInterval:
+            self.TicksLate += 1
+
+    def OnFrame(self):
+        now = perf_counter_ns()
+        last = self.LastFrame
+        if last is not None:
+            missed = (now - last) // self.FrameInterval - 1
+            if missed > 0:
+                self.FramesDropped += missed
+        self.LastFrame = now
+
+    def Stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        :return: {phase: {"p50": ms, "p95": ms, "p99": ms, "count": n}}
+        """
+        stats = {}
+        for phase, samples in self.Samples.items():
+            p50, p95, p99 = samples.Percentiles(50, 95, 99)
+            stats[phase] = {"p50": p50 / 1e6, "p95": p95 / 1e6, "p99": p99 / 1e6, "count": samples.Count}
+        return stats
+
+    def PaintOn(self, canvas: Canvas):
+        v = self.viewer
+        v.Bind(canvas)
+        v.X = 0
+        v.Y = canvas.Height - 1
+        v.Width = canvas.Width
+        v.Height = 1
+        parts = []
+        stats = self.Stats()
+        for phase in self.Phases:
+            if phase in stats:
+                s = stats[phase]
+                parts.append(f"{phase} {s['p50']:.2f}/{s['p95']:.2f}/{s['p99']:.2f}")
+        parts.append(f"dropped {self.FramesDropped}")
+        parts.append(f"late {self.TicksLate}")
+        v.Str(0, 0, utils.fillto(" | ".join(parts), " ", canvas.Width))
+
+    def MaybeDump(self):
+        if self.DumpPath and perf_counter() - self.LastDump >= self.DumpEvery:
+            self.Dump(self.DumpPath)
+
+    def Dump(self, path: str):
+        self.LastDump = perf_counter()
+        stats = self.Stats()
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["phase", "p50_ms", "p95_ms", "p99_ms", "count"])
+                for phase, s in stats.items():
+                    writer.writerow([phase, s["p50"], s["p95"], s["p99"], s["count"]])
+                writer.writerow(["FramesDropped", "", "", "", self.FramesDropped])
+                writer.writerow(["TicksLate", "", "", "", self.TicksLate])
+        else:
+            with open(path, "w") as f:
+                json.dump({"phases": stats, "framesDropped": self.FramesDropped, "ticksLate": self.TicksLate}, f,
+                          indent=1)
@@ -0,0 +1,267 @@
+import argparse
+import hashlib
+import sys
+from collections import namedtuple
+from time import perf_counter
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from Games import Game, Operation
+from Shared import *
+
+Magic = b"SNKR"
+Version = 1
+# The ticks per second of a live game, see main.py
+RealtimeTps = 20
+
+# Bits of the header's flags
+FoodStoreFlag = 1
+
+# A record is varint(tick delta << 3 | code), a checkpoint is followed by its 8 byte frame hash.
+# Codes 0-3 are the operations in the order of Operation.
+Checkpoint = 4
+End = 5
+CodeBits = 3
+
+Operations: List[Operation] = list(Operation)
+OperationCodes = {op: code for code, op in enumerate(Operations)}
+
+# (tick, code, frame hash or 0)
+Record = Tuple[int, int, int]
+
+ReplayResult = namedtuple("ReplayResult", ["ticks", "score", "length", "seconds", "tps", "checked", "mismatches"])
+
+
+def WriteVarint(out: bytearray, value: int):
+    """
+    Appends an unsigned LEB128 varint, 7 bits per byte with the lowest first.
+    """
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def ReadVarint(data: bytes, pos: int) -> Tuple[int, int]:
+    """
+    :return: the value and the position after it
+    """
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("truncated replay")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def ZigZag(value: int) -> int:
+    """
+    Maps signed to unsigned so small negative numbers stay short: 0, -1, 1, -2... -> 0, 1, 2, 3...
+    """
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def UnZigZag(value: int) -> int:
+    return value >> 1 if value & 1 == 0 else -(value >> 1) - 1
+
+
+class FrameHasher:
+    """
+    Paints the whole game into its own buffers and hashes them, the game's incremental painting isn't disturbed.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.CharMatrix: ndarray = np.full((height, width), " ", dtype=str)
+        self.AttrMatrix: ndarray = NewAttributes(height, width)
+        self.DirtyMarks: ndarray = np.full((height,), False, dtype=bool)
+        self.Canvas = BufferCanvas(width, height, self.CharMatrix, self.DirtyMarks, self.AttrMatrix)
+
+    def Hash(self, game: Game) -> int:
+        game.PaintAll(self.Canvas)
+        digest = hashlib.blake2b(self.CharMatrix.tobytes(), digest_size=8)
+        digest.update(self.AttrMatrix.tobytes())
+        return int.from_bytes(digest.digest(), "little")
+
+
+class ReplayRecorder:
+    """
+    Records what's needed to replay a game: its seed, board size and every operation with the tick it came at.
+    Checkpoints with a hash of the frame are taken every few ticks, so a replay can tell where it went off.
+    Attach it right after the game was initialized, anything which tunes the game afterwards isn't recorded.
+    """
+
+    def __init__(self, game: Game, checkpoint_every: int = 1200):
+        """
+        :param checkpoint_every: ticks between checkpoints, 0 for none but the last one
+        """
+        if game.Seed is None:
+            raise ValueError("only a seeded game can be replayed")
+        self.Game = game
+        self.CheckpointEvery = checkpoint_every
+        self.Hasher = FrameHasher(game.Width, game.Height)
+        self.Records = bytearray()
+        self.LastTick = game.Ticks
+        self.LastCheckpoint = -1
+        self.Closed = False
+        game.Recorder = self
+
+    def Append(self, tick: int, code: int):
+        WriteVarint(self.Records, (tick - self.LastTick) << CodeBits | code)
+        self.LastTick = tick
+
+    def OnOp(self, game: Game, op: Operation):
+        self.Append(game.Ticks, OperationCodes[op])
+
+    def OnTick(self, game: Game):
+        every = self.CheckpointEvery
+        if every and game.Ticks % every == 0:
+            self.AddCheckpoint(game)
+
+    def AddCheckpoint(self, game: Game):
+        self.Append(game.Ticks, Checkpoint)
+        self.Records += self.Hasher.Hash(game).to_bytes(8, "little")
+        self.LastCheckpoint = game.Ticks
+
+    def Close(self):
+        """
+        Ends the replay at the current tick with a last checkpoint and stops recording.
+        """
+        if self.Closed:
+            return
+        game = self.Game
+        if self.LastCheckpoint != game.Ticks:
+            self.AddCheckpoint(game)
+        self.Append(game.Ticks, End)
+        game.Recorder = None
+        self.Closed = True
+
+    def ToBytes(self) -> bytes:
+        self.Close()
+        game = self.Game
+        header = bytearray(Magic)
+        WriteVarint(header, Version)
+        WriteVarint(header, ZigZag(game.Seed))
+        WriteVarint(header, game.Width)
+        WriteVarint(header, game.Height)
+        WriteVarint(header, FoodStoreFlag if game.FoodStore is not None else 0)
+        return bytes(header + self.Records)
+
+    def Save(self, path: str) -> int:
+        """
+        :return: the size of the replay in bytes
+        """
+        data = self.ToBytes()
+        with open(path, "wb") as f:
+            f.write(data)
+        return len(data)
+
+
+class Replay:
+    def __init__(self, seed: int, width: int, height: int, flags: int, records: bytes):
+        self.Seed = seed
+        self.Width = width
+        self.Height = height
+        self.Flags = flags
+        self.Data = records
+
+    @staticmethod
+    def FromBytes(data: bytes) -> "Replay":
+        if data[:len(Magic)] != Magic:
+            raise ValueError("not a replay")
+        pos = len(Magic)
+        version, pos = ReadVarint(data, pos)
+        if version != Version:
+            raise ValueError(f"unsupported replay version {version}")
+        seed, pos = ReadVarint(data, pos)
+        width, pos = ReadVarint(data, pos)
+        height, pos = ReadVarint(data, pos)
+        flags, pos = ReadVarint(data, pos)
+        return Replay(UnZigZag(seed), width, height, flags, data[pos:])
+
+    @staticmethod
+    def Load(path: str) -> "Replay":
+        with open(path, "rb") as f:
+            return Replay.FromBytes(f.read())
+
+    def Records(self) -> Iterator[Record]:
+        data = self.Data
+        pos = 0
+        tick = 0
+        mask = (1 << CodeBits) - 1
+        while pos < len(data):
+            value, pos = ReadVarint(data, pos)
+            tick += value >> CodeBits
+            code = value & mask
+            frame_hash = 0
+            if code == Checkpoint:
+                frame_hash = int.from_bytes(data[pos:pos + 8], "little")
+                pos += 8
+            yield tick, code, frame_hash
+            if code == End:
+                return
+        raise ValueError("truncated replay")
+
+    def NewGame(self) -> Game:
+        game = Game(self.Width, self.Height, self.Seed)
+        game.Initialize()
+        if self.Flags & FoodStoreFlag:
+            game.UseFoodStore()
+        return game
+
+
+def Play(replay: Replay, check: bool = True) -> ReplayResult:
+    """
+    Feeds the recorded operations back into a new game at their ticks, as fast as possible.
+    :param check: whether to compare the frame at every checkpoint
+    :return: mismatches are the ticks of the checkpoints whose frame differs
+    """
+    game = replay.NewGame()
+    hasher = FrameHasher(game.Width, game.Height) if check else None
+    checked = 0
+    mismatches: List[int] = []
+    tick = game.Tick
+    start = perf_counter()
+    for at, code, frame_hash in replay.Records():
+        for _ in range(at - game.Ticks):
+            tick()
+        if code < Checkpoint:
+            game.AddOp(Operations[code])
+        elif code == Checkpoint:
+            if hasher is not None:
+                checked += 1
+                if hasher.Hash(game) != frame_hash:
+                    mismatches.append(at)
+        else:
+            break
+    seconds = perf_counter() - start
+    snake = game.Snake
+    return ReplayResult(
+        ticks=game.Ticks, score=snake.Score, length=len(snake.Bodies) + 1, seconds=seconds,
+        tps=game.Ticks / seconds if seconds > 0 else float("inf"), checked=checked, mismatches=mismatches
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replays a recorded game without any terminal.")
+    parser.add_argument("replay", help="the file recorded with --record")
+    parser.add_argument("--no-check", action="store_true", help="don't compare the frames at the checkpoints")
+    args = parser.parse_args(argv)
+    replay = Replay.Load(args.replay)
+    result = Play(replay, check=not args.no_check)
+    print(f"seed={replay.Seed} ticks={result.ticks} score={result.score} length={result.length} "
+          f"time={result.seconds:.3f}s {result.tps:.0f} ticks/s ({result.tps / RealtimeTps:.0f}x realtime) "
+          f"checkpoints={result.checked} mismatches={len(result.mismatches)}")
+    if result.mismatches:
+        print(f"first mismatch at tick {result.mismatches[0]}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,222 @@
-from typing import Iterable
+from typing import Iterable, List, Optional, Tuple
 
+import numpy as np
 from numpy import ndarray
 
+from Core import Block, BlockSize, Canvas, ClipBlock, Palette
+
 Buffer = ndarray
 DirtyMarks = ndarray
+# One Palette value per cell, parallel to a Buffer
+Attributes = ndarray
+Span = Tuple[int, int, str]
+# (y, x, text, attribute)
+Run = Tuple[int, int, str, int]
+
+
+def NewAttributes(height: int, width: int) -> Attributes:
+    return np.zeros((height, width), dtype=np.uint8)
+
+
+def ArrayOf(block: Block) -> ndarray:
+    """
+    Views a block as a 2-D `<U1` array, strings are reinterpreted rather than split char by char.
+    """
+    if isinstance(block, ndarray):
+        return block if block.ndim == 2 else block.reshape(1, -1)
+    if isinstance(block, str):
+        return np.frombuffer(block.encode("utf-32-le"), dtype="<U1").reshape(1, -1)
+    width, height = BlockSize(block)
+    text = "".join(block)
+    if len(text) != width * height:
+        raise ValueError("the rows of a block must be equally long")
+    return np.frombuffer(text.encode("utf-32-le"), dtype="<U1").reshape(height, width)
+
+
+class BufferCanvas(Canvas):
+    """
+    A canvas which only writes into a `<U1` NumPy buffer and marks the touched rows dirty.
+    """
+
+    def __init__(self, width: int, height: int, buffer: Buffer, dirty_marks: DirtyMarks,
+                 attributes: Optional[Attributes] = None):
+        self._width = width
+        self._height = height
+        self.buffer: Buffer = buffer
+        self.dirty_marks: DirtyMarks = dirty_marks
+        self.attributes: Optional[Attributes] = attributes
+
+    @property
+    def Width(self):
+        return self._width
+
+    @property
+    def Height(self):
+        return self._height
+
+    def Char(self, x, y, char: str):
+        if 0 <= x < self.Width and 0 <= y < self.Height:
+            self.buffer[y, x] = char
+            attributes = self.attributes
+            if attributes is not None:
+                attributes[y, x] = Palette.Default
+            self.dirty_marks[y] = True
+
+    def Str(self, x, y, string: Iterable[str]):
+        width = self.Width
+        height = self.Height
+        buffer = self.buffer
+        marks = self.dirty_marks
+        end = x
+        for i, char in enumerate(string):
+            nx = x + i
+            if 0 <= nx < width and 0 <= y < height:
+                buffer[y, nx] = char
+            end = nx + 1
+        if 0 <= y < height:
+            attributes = self.attributes
+            if attributes is not None:
+                attributes[y, max(x, 0):max(min(end, width), 0)] = Palette.Default
+            marks[y] = True
+
+    def Blit(self, x: int, y: int, block: Block):
+        """
+        Clips the block once and assigns it into the buffer as one slice.
+        """
+        width, height = BlockSize(block)
+        x1 = max(0, -x)
+        y1 = max(0, -y)
+        x2 = min(width, self.Width - x)
+        y2 = min(height, self.Height - y)
+        if x1 >= x2 or y1 >= y2:
+            return
+        if x1 > 0 or y1 > 0 or x2 < width or y2 < height:
+            block = ClipBlock(block, x1, x2, y1, y2)
+        top = y + y1
+        bottom = y + y2
+        left = x + x1
+        right = x + x2
+        self.buffer[top:bottom, left:right] = ArrayOf(block)
+        attributes = self.attributes
+        if attributes is not None:
+            attributes[top:bottom, left:right] = Palette.Default
+        self.dirty_marks[top:bottom] = True
+
+    def Points(self, xs: ndarray, ys: ndarray, char: str, color: Palette = Palette.Default):
+        """
+        Clips with a mask and scatters the char into the buffer with fancy indexing.
+        """
+        if len(xs) == 0:
+            return
+        inside = (xs >= 0) & (xs < self.Width) & (ys >= 0) & (ys < self.Height)
+        if not inside.all():
+            xs = xs[inside]
+            ys = ys[inside]
+        self.buffer[ys, xs] = char
+        attributes = self.attributes
+        if attributes is not None:
+            attributes[ys, xs] = color
+        # Repeated rows are just marked again, cheaper than deduplicating them first.
+        self.dirty_marks[ys] = True
+
+    def Color(self, x: int, y: int, color: Palette):
+        attributes = self.attributes
+        if attributes is not None and 0 <= x < self.Width and 0 <= y < self.Height:
+            attributes[y, x] = color
+            self.dirty_marks[y] = True
+
+    def Colors(self, x1: int, x2: int, y1: int, y2: int, color: Palette):
+        attributes = self.attributes
+        if attributes is None:
+            return
+        x1 = max(x1, 0)
+        y1 = max(y1, 0)
+        x2 = min(x2, self.Width)
+        y2 = min(y2, self.Height)
+        if x1 < x2 and y1 < y2:
+            attributes[y1:y2, x1:x2] = color
+            self.dirty_marks[y1:y2] = True
+
+
+def RowsOf(array2D: ndarray) -> ndarray:
+    """
+    Views a C-contiguous `<U1` matrix as a 1-D array holding one `<U{column}` string per row.
+    No data is copied, str(rows[i]) decodes the whole row at once.
+    """
+    column = array2D.shape[1]
+    return array2D.view(np.dtype((np.str_, column))).reshape(array2D.shape[0])
+
+
+def StrOf(array1D: ndarray) -> str:
+    """
+    Decodes a contiguous 1-D `<U1` array into a str in one step.
+    """
+    return str(array1D.view(np.dtype((np.str_, array1D.shape[0])))[0])
+
+
+def DiffSpans(back: ndarray, front: ndarray, gap: int = 0) -> List[Span]:
+    """
+    Finds the runs of cells which differ between the new frame and the flushed one.
+    Two changed cells no more than `gap` unchanged cells apart are merged into one run,
+    because resending a few cells is cheaper than moving the cursor again.
+    :param back: the new frame
+    :param front: the frame currently on the screen
+    :return: [(y, x, text)]
+    """
+    ys, xs = np.nonzero(back != front)
+    total = len(ys)
+    if total == 0:
+        return []
+    breaks = np.flatnonzero((np.diff(ys) != 0) | (np.diff(xs) > gap + 1))
+    starts = np.concatenate(([0], breaks + 1)).tolist()
+    ends = np.concatenate((breaks, [total - 1])).tolist()
+    ys = ys.tolist()
+    xs = xs.tolist()
+    spans = []
+    for s, e in zip(starts, ends):
+        y = ys[s]
+        x = xs[s]
+        spans.append((y, x, StrOf(back[y, x:xs[e] + 1])))
+    return spans
+
+
+def DiffRuns(back: ndarray, front: ndarray, back_attrs: Attributes, front_attrs: Attributes,
+             gap: int = 0) -> List[Run]:
+    """
+    Like DiffSpans, but a cell also changes when its attribute does,
+    and a run never spans two attributes, so each run is sent with a single attribute.
+    :return: [(y, x, text, attribute)]
+    """
+    ys, xs = np.nonzero((back != front) | (back_attrs != front_attrs))
+    total = len(ys)
+    if total == 0:
+        return []
+    # Numbers the stretches of equal attributes along each row.
+    stretches = np.zeros(back_attrs.shape, dtype=np.int32)
+    np.cumsum(back_attrs[:, 1:] != back_attrs[:, :-1], axis=1, out=stretches[:, 1:])
+    stretch = stretches[ys, xs]
+    breaks = np.flatnonzero((np.diff(ys) != 0) | (np.diff(xs) > gap + 1) | (np.diff(stretch) != 0))
+    starts = np.concatenate(([0], breaks + 1)).tolist()
+    ends = np.concatenate((breaks, [total - 1])).tolist()
+    ys = ys.tolist()
+    xs = xs.tolist()
+    runs = []
+    for s, e in zip(starts, ends):
+        y = ys[s]
+        x = xs[s]
+        runs.append((y, x, StrOf(back[y, x:xs[e] + 1]), int(back_attrs[y, x])))
+    return runs
+
+
+def AttributeRuns(attrs: ndarray) -> List[Tuple[int, int, int]]:
+    """
+    Splits a row of attributes into stretches of the same one.
+    :return: [(start, end, attribute)]
+    """
+    bounds = (np.flatnonzero(attrs[1:] != attrs[:-1]) + 1).tolist()
+    starts = [0] + bounds
+    ends = bounds + [len(attrs)]
+    return [(s, e, int(attrs[s])) for s, e in zip(starts, ends)]
 
 
 def Iterate2DRow(array2D: ndarray, row_index: int) -> Iterable:
@@ -0,0 +1,140 @@
+import threading
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+import numpy as np
+
+from Core import *
+from Linuxs import LinuxDiffRender, LinuxCanvas
+from Shared import *
+
+# (sequence number, chars, attributes)
+Frame = Tuple[int, ndarray, ndarray]
+
+
+class ThreadedRender(IRender):
+    """
+    Flushes frames to the terminal on a background thread.
+    The game keeps painting incrementally into the inner render's CharMatrix and AttrMatrix,
+    Render() copies a finished frame into one of three preallocated buffers and publishes it.
+    The render thread always flushes the latest published frame, older ones are skipped.
+    Buffers are handed over through deques, whose append and pop are atomic, so publishing takes no lock.
+    """
+
+    def __init__(self, inner: LinuxDiffRender, buffers: int = 3):
+        self.Inner = inner
+        self.BufferCount = buffers
+        self.Free: Deque[Tuple[ndarray, ndarray]] = deque()
+        self.Ready: Deque[Frame] = deque()
+        self.Sequence = 0
+        self.Flushed = 0
+        self.FramesSkipped = 0
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def Screen(self):
+        return self.Inner.Screen
+
+    @property
+    def ScreenLock(self):
+        return self.Inner.ScreenLock
+
+    def Initialize(self):
+        self.Inner.Initialize()
+
+    def OnResized(self):
+        self.Inner.OnResized()
+
+    def CreateCanvas(self) -> LinuxCanvas:
+        inner = self.Inner
+        with inner.ScreenLock:
+            canvas = inner.CreateCanvas()
+            shape = inner.CharMatrix.shape
+            # Frames of another size are dropped when they come back.
+            self.Ready.clear()
+            self.Free.clear()
+            for _ in range(self.BufferCount):
+                self.Free.append((np.full(shape, " ", dtype=str), NewAttributes(*shape)))
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="render", daemon=True)
+            self._thread.start()
+        return canvas
+
+    def Render(self, canvas: Canvas):
+        inner = self.Inner
+        dm = inner.DirtyMarks
+        if not dm.any():
+            return
+        chars, attrs = self._acquire(inner.CharMatrix.shape)
+        np.copyto(chars, inner.CharMatrix)
+        np.copyto(attrs, inner.AttrMatrix)
+        dm[:] = False
+        self.Sequence += 1
+        self.Ready.append((self.Sequence, chars, attrs))
+        # Reclaim what the render thread hasn't taken yet, a newer frame supersedes it.
+        while len(self.Ready) > 1:
+            try:
+                stale = self.Ready.popleft()
+            except IndexError:
+                break
+            self._release(stale)
+        self._wake.set()
+
+    def _acquire(self, shape) -> Tuple[ndarray, ndarray]:
+        try:
+            chars, attrs = self.Free.popleft()
+        except IndexError:
+            # Only when a resize threw the buffers away while a frame was in flight.
+            chars = None
+        if chars is None or chars.shape != shape:
+            chars = np.full(shape, " ", dtype=str)
+            attrs = NewAttributes(*shape)
+        return chars, attrs
+
+    def _release(self, frame: Frame):
+        if len(self.Free) < self.BufferCount:
+            self.Free.append(frame[1:])
+
+    def _run(self):
+        inner = self.Inner
+        wake = self._wake
+        while True:
+            wake.wait()
+            wake.clear()
+            if self._stopping:
+                return
+            newest: Optional[Frame] = None
+            while True:
+                try:
+                    frame = self.Ready.pop()
+                except IndexError:
+                    break
+                if newest is None or frame[0] > newest[0]:
+                    if newest is not None:
+                        self._release(newest)
+                    newest = frame
+                else:
+                    self._release(frame)
+            if newest is None:
+                continue
+            seq, chars, attrs = newest
+            if seq <= self.Flushed:
+                self._release(newest)
+                continue
+            self.FramesSkipped += seq - self.Flushed - 1
+            with inner.ScreenLock:
+                if inner.FrontMatrix is not None and chars.shape == inner.FrontMatrix.shape:
+                    inner.Flush(chars, attrs)
+            self.Flushed = seq
+            self._release(newest)
+
+    def Dispose(self):
+        thread = self._thread
+        if thread is not None:
+            self._stopping = True
+            self._wake.set()
+            thread.join()
+            self._thread = None
+        self.Inner.Dispose()
@@ -3,13 +3,24 @@ import win32con
 import win32console
 from win32console import PyConsoleScreenBufferType, PyCOORDType
 
-import utils
 from Core import *
 from Shared import *
 
 XY = PyCOORDType
 CSBuffer = PyConsoleScreenBufferType
 
+# Console attributes of each Palette color, Windows swaps the red and blue bits of ANSI's numbering
+ConsoleColors = np.array([
+    win32con.FOREGROUND_RED | win32con.FOREGROUND_GREEN | win32con.FOREGROUND_BLUE,
+    win32con.FOREGROUND_RED | win32con.FOREGROUND_INTENSITY,
+    win32con.FOREGROUND_GREEN | win32con.FOREGROUND_INTENSITY,
+    win32con.FOREGROUND_RED | win32con.FOREGROUND_GREEN | win32con.FOREGROUND_INTENSITY,
+    win32con.FOREGROUND_BLUE | win32con.FOREGROUND_INTENSITY,
+    win32con.FOREGROUND_RED | win32con.FOREGROUND_BLUE | win32con.FOREGROUND_INTENSITY,
+    win32con.FOREGROUND_GREEN | win32con.FOREGROUND_BLUE | win32con.FOREGROUND_INTENSITY,
+    win32con.FOREGROUND_RED | win32con.FOREGROUND_GREEN | win32con.FOREGROUND_BLUE | win32con.FOREGROUND_INTENSITY,
+], dtype=np.uint16)
+
 """
 |---x--------->
 | 0 1 2 3 4 5 6
@@ -19,44 +30,8 @@ v 3 4 5 6 7 8 9
 """
 
 
-class WinCanvas(Canvas):
-
-    def __init__(self, width: int, height: int, buffer: Buffer, dirty_marks: DirtyMarks):
-        self.__width = width
-        self.__height = height
-        self.buffer: Buffer = buffer
-        self.dirty_marks: DirtyMarks = dirty_marks
-
-    @property
-    def Width(self):
-        return self.__width
-
-    @property
-    def Height(self):
-        return self.__height
-
-    def Char(self, x, y, char: str):
-        if 0 <= x < self.Width and 0 <= y < self.Height:
-            self.buffer[y, x] = char
-            self.dirty_marks[y] = True
-
-    def Str(self, x, y, string: Iterable[str]):
-        width = self.Width
-        height = self.Height
-        buffer = self.buffer
-        marks = self.dirty_marks
-        for i, char in enumerate(string):
-            nx = x + i
-            if 0 <= nx < width and 0 <= y < height:
-                buffer[y, nx] = char
-        if 0 <= y < height:
-            marks[y] = True
-
-    def Color(self, x: int, y: int, color):
-        pass
-
-    def Colors(self, x1: int, x2: int, y1: int, y2: int, color):
-        pass
+class WinCanvas(BufferCanvas):
+    pass
 
 
 class WinRender(IRender):
@@ -64,6 +39,7 @@ class WinRender(IRender):
     def __init__(self):
         super().__init__()
         self.CharMatrix: Optional[ndarray] = None
+        self.AttrMatrix: Optional[ndarray] = None
         self.DirtyMarks: Optional[ndarray] = None
         self.buffer: Optional[CSBuffer] = None
         self.width: int = 0
@@ -85,9 +61,10 @@ class WinRender(IRender):
         self.height = size.Y
         size = self.height, self.width
         heights = self.height,
-        if not self.CharMatrix or self.CharMatrix.shape != size:
+        if self.CharMatrix is None or self.CharMatrix.shape != size:
             self.CharMatrix = np.full(size, " ", dtype=str)
-        if not self.DirtyMarks or self.DirtyMarks.shape != heights:
+            self.AttrMatrix = NewAttributes(*size)
+        if self.DirtyMarks is None or self.DirtyMarks.shape != heights:
             self.DirtyMarks = np.full(heights, False, dtype=bool)
         self.NeedRegen = False
 
@@ -97,20 +74,23 @@ class WinRender(IRender):
     def CreateCanvas(self) -> WinCanvas:
         if self.NeedRegen:
             self.RegenBuffer()
-        return WinCanvas(self.width, self.height, self.CharMatrix, self.DirtyMarks)
+        return WinCanvas(self.width, self.height, self.CharMatrix, self.DirtyMarks, self.AttrMatrix)
 
     def Render(self, canvas: Canvas):
         if isinstance(canvas, WinCanvas):
             cm = self.CharMatrix
             buf = self.buffer
             dm = self.DirtyMarks
-            for i, dirty in enumerate(dm):
-                if dirty:
-                    line = utils.chain(Iterate2DRow(cm, i))
-                    buf.WriteConsoleOutputCharacter(
-                        line, XY(0, i)
-                    )
-                    dm[i] = False
+            rows = RowsOf(cm)
+            dirty = np.flatnonzero(dm)
+            # The whole dirty rows' attributes are looked up at once.
+            colors = ConsoleColors[self.AttrMatrix[dirty]].tolist()
+            for i, row_colors in zip(dirty.tolist(), colors):
+                buf.WriteConsoleOutputCharacter(
+                    str(rows[i]), XY(0, i)
+                )
+                buf.WriteConsoleOutputAttribute(tuple(row_colors), XY(0, i))
+            dm[:] = False
 
     def Dispose(self):
         pass
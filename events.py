@@ -1,19 +1,54 @@
-from typing import Iterable
+from types import MethodType
+from typing import Callable, Iterable, Optional, Tuple
+from weakref import ref, ReferenceType
 
 IsCanceled = bool
 Canceled = True
 NotCanceled = False
 
+Subscriber = Callable[..., object]
+# (weak reference to a bound method's object, its function) or (None, any other callable)
+_Entry = Tuple[Optional[ReferenceType], Callable[..., object]]
+
+
+def _resolve(entry: _Entry) -> Optional[Subscriber]:
+    owner, func = entry
+    if owner is None:
+        return func
+    obj = owner()
+    return None if obj is None else MethodType(func, obj)
+
 
 class event:
+    """
+    Calls its subscribers in the order they subscribed.
+    Subscribers are kept in a tuple which is replaced, never mutated, on (un)subscribing,
+    so a handler may (un)subscribe while the event is being raised, it takes effect from the next time.
+    Bound methods are only weakly referenced, subscribing doesn't keep their object alive.
+    """
+
     def __init__(self, cancelable=False):
-        self.subscribers = set()
+        self._entries: Tuple[_Entry, ...] = ()
         self._cancelable = cancelable
 
     @property
     def cancelable(self) -> bool:
         return self._cancelable
 
+    @property
+    def subscribers(self) -> Tuple[Subscriber, ...]:
+        """
+        The living subscribers in order.
+        """
+        return tuple(s for s in map(_resolve, self._entries) if s is not None)
+
+    @property
+    def HasSubscribers(self) -> bool:
+        """
+        Whether any subscriber is still alive.
+        """
+        return any(owner is None or owner() is not None for owner, _ in self._entries)
+
     def __call__(self, sender, *args, **kwargs) -> IsCanceled:
         """
         Raise the event
@@ -22,33 +57,59 @@ class event:
         """
         return self.invoke(sender, *args, **kwargs)
 
+    def _index(self, subscriber) -> int:
+        for i, entry in enumerate(self._entries):
+            if _resolve(entry) == subscriber:
+                return i
+        return -1
+
     def add(self, *args) -> "event":
         for subscriber in args:
-            self.subscribers.add(subscriber)
+            if self._index(subscriber) >= 0:
+                continue
+            if isinstance(subscriber, MethodType):
+                entry = (ref(subscriber.__self__, self._prune), subscriber.__func__)
+            else:
+                entry = (None, subscriber)
+            self._entries = self._entries + (entry,)
         return self
 
     def remove(self, subscriber) -> "event":
-        self.subscribers.remove(subscriber)
+        i = self._index(subscriber)
+        if i < 0:
+            raise KeyError(subscriber)
+        entries = self._entries
+        self._entries = entries[:i] + entries[i + 1:]
         return self
 
     def clear(self) -> "event":
-        self.subscribers.clear()
+        self._entries = ()
         return self
 
+    def _prune(self, dead: ReferenceType):
+        self._entries = tuple(e for e in self._entries if e[0] is not dead)
+
     def invoke(self, sender, *args, **kwargs) -> IsCanceled:
         """
         Raise the event
         :param sender: first para must be the sender
         :return: whether the event was canceled
         """
-        if self.cancelable:
-            for subscriber in self.subscribers:
-                canceled = subscriber(sender, *args, **kwargs)
-                if canceled:
-                    return Canceled
-        else:
-            for subscriber in self.subscribers:
-                subscriber(sender, *args, **kwargs)
+        entries = self._entries
+        if not entries:
+            return NotCanceled
+        cancelable = self._cancelable
+        for owner, func in entries:
+            if owner is None:
+                canceled = func(sender, *args, **kwargs)
+            else:
+                # Calling the function with its object saves building a bound method.
+                obj = owner()
+                if obj is None:
+                    continue
+                canceled = func(obj, sender, *args, **kwargs)
+            if cancelable and canceled:
+                return Canceled
         return NotCanceled
 
     def __iadd__(self, other):
@@ -56,3 +117,4 @@ class event:
             self.add(*other)
         else:
             self.add(other)
+        return self
@@ -1,88 +1,204 @@
+import argparse
 import platform
+import random
+import sys
 
-sysinfo = platform.system()
 from Core import *
+from Games import *
+from Inputs import DrainKeys
+from Profiler import PhaseProfiler
+from Replays import ReplayRecorder
+
+
+def main():
+    """
+    Runs the game in the terminal, or the batch runs with "main.py batch".
+    It's only called when main.py is run, so processes which import main.py, e.g. the batch's spawned workers,
+    don't start a game.
+    """
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        import Batch
 
-render: IRender
-if sysinfo == "Windows":
-    import Windows
-    import msvcrt
+        Batch.main(sys.argv[2:])
+        return
 
-    def getch():
-        ch_num = ord(msvcrt.getwch())
-        if ch_num == 0xe0:
+    sysinfo = platform.system()
+    render: IRender
+    if sysinfo == "Windows":
+        import Windows
+        import msvcrt
+        import time
+
+        def getch():
             ch_num = ord(msvcrt.getwch())
-        return ch_num
-    can_get_ch = msvcrt.kbhit
-    render = Windows.WinRender()
-    c_left = 75
-    c_right = 77
-    c_down = 80
-    c_up = 72
-    c_q = ord('q')
-else:
-    import Linuxs
-    import curses
-    render: Linuxs.LinuxRender = Linuxs.LinuxRender()
-
-
-    def getch():
-        try:
-            return render.Screen.get_wch()
-        except:
-            return None
-
-
-    can_get_ch = lambda: True
-    c_left = curses.KEY_LEFT
-    c_right = curses.KEY_RIGHT
-    c_down = curses.KEY_DOWN
-    c_up = curses.KEY_UP
-    c_q = ord('q')
+            if ch_num == 0xe0:
+                ch_num = ord(msvcrt.getwch())
+            return ch_num
+        can_get_ch = msvcrt.kbhit
 
-from Games import *
+        def wait_input(timeout: float) -> bool:
+            # The console can't be selected on Windows, so it polls in short naps.
+            end = time.perf_counter() + timeout
+            while not msvcrt.kbhit():
+                rest = end - time.perf_counter()
+                if rest <= 0:
+                    return False
+                time.sleep(min(rest, 0.005))
+            return True
+        render = Windows.WinRender()
+        c_left = 75
+        c_right = 77
+        c_down = 80
+        c_up = 72
+        c_q = ord('q')
+        c_p = ord('p')
+        c_resize = None
+        input_fd = None
+    else:
+        import Linuxs
+        import curses
+        import select
+        render: Linuxs.LinuxRender = Linuxs.LinuxDiffRender()
 
-import sys
+        def getch():
+            try:
+                with render.ScreenLock:
+                    ch = render.Screen.get_wch()
+            except:
+                return None
+            # get_wch() gives a str for ordinary keys and an int for special ones.
+            return ord(ch) if isinstance(ch, str) else ch
+
+        can_get_ch = lambda: True
+
+        def wait_input(timeout: float) -> bool:
+            return bool(select.select([sys.stdin], [], [], timeout)[0])
+
+        input_fd = sys.stdin.fileno()
+
+        c_left = curses.KEY_LEFT
+        c_right = curses.KEY_RIGHT
+        c_down = curses.KEY_DOWN
+        c_up = curses.KEY_UP
+        c_q = ord('q')
+        c_p = ord('p')
+        c_resize = curses.KEY_RESIZE
+
+    parser = argparse.ArgumentParser(description="A snake game on command line.")
+    parser.add_argument("attach", nargs="?", choices=["x"], help="waits for a debugger to attach")
+    parser.add_argument("--profile", action="store_true", help="starts with the profiler overlay on, toggle it with P")
+    parser.add_argument("--profile-dump", help="dumps the profiler stats periodically into this *.json or *.csv")
+    parser.add_argument("--runtime", choices=["sync", "async"], default="sync",
+                        help="sync: one loop waiting on a scheduler, async: asyncio tasks for input, ticks and frames")
+    parser.add_argument("--render", choices=["curses", "ansi"], default="curses",
+                        help="ansi: writes raw escape sequences, one write per frame (not on Windows)")
+    parser.add_argument("--threaded-render", action="store_true",
+                        help="flushes frames to the terminal on a background thread (curses only)")
+    parser.add_argument("--record", help="saves a replay of the game into this file on quit")
+    args = parser.parse_args()
+    if args.render == "ansi" and sysinfo != "Windows":
+        import Ansis
+
+        render = Ansis.AnsiRender()
+        getch = render.GetCh
+    if args.threaded_render and sysinfo != "Windows":
+        from ThreadedRender import ThreadedRender
 
-args = sys.argv
-if len(args) > 1 and args[1] == "x":
-    input("Attach:")
-from timers import timer
-
-render.Initialize()
-canvas = render.CreateCanvas()
-game = Game(canvas.Width, canvas.Height)
-
-rps = timer.byFps(60)
-rps.reset()
-lps = timer.byFps(20)
-lps.reset()
-
-OperationMap = {
-    c_up: Operation.MoveUp,
-    c_down: Operation.MoveDown,
-    c_left: Operation.MoveLeft,
-    c_right: Operation.MoveRight,
-}
-
-game.Initialize()
-try:
-    while True:
-        if can_get_ch():
-            ch_num = getch()
-            if ch_num == c_q:
+        render = ThreadedRender(render)
+    if args.attach == "x":
+        input("Attach:")
+    from timers import timer, scheduler, now_seconds
+
+    render.Initialize()
+    canvas = render.CreateCanvas()
+    # A replay needs to know the seed.
+    game = Game(canvas.Width, canvas.Height, random.getrandbits(32) if args.record else None)
+
+    rps = timer.byFps(60)
+    lps = timer.byFps(20)
+    sched = scheduler(lps, rps)
+    sched.reset()
+
+    profiler = PhaseProfiler(lps.time, rps.time, dump_path=args.profile_dump)
+    for phase in ("Tick", "HandleOp", "CheckCollide", "HandleTasks", "PaintOn"):
+        profiler.Hook(game, phase)
+    profiler.Hook(render, "Render")
+    profiler.Watch("InputLatency", game.Turns.Latencies)
+    if args.profile:
+        profiler.Enable()
+
+    OperationMap = {
+        c_up: Operation.MoveUp,
+        c_down: Operation.MoveDown,
+        c_left: Operation.MoveLeft,
+        c_right: Operation.MoveRight,
+    }
+
+    def OnKey(ch_num) -> bool:
+        """
+        :return: whether to quit
+        """
+        nonlocal canvas
+        if ch_num == c_q:
+            return True
+        elif ch_num == c_p:
+            profiler.Toggle()
+            # The overlay covered a row of the game.
+            game.Invalidate()
+        elif ch_num == c_resize:
+            render.OnResized()
+            canvas = render.CreateCanvas()
+            game.Invalidate()
+        elif ch_num in OperationMap:
+            op = OperationMap[ch_num]
+            game.AddOp(op)
+        return False
+
+    def poll():
+        return getch() if can_get_ch() else None
+
+    def RunSync():
+        while True:
+            sched.wait(game.NeedRender or profiler.Enabled, wait_input)
+            if DrainKeys(poll, OnKey):
                 break
-            elif ch_num in OperationMap:
-                op = OperationMap[ch_num]
-                game.AddOp(op)
-
-        if lps.is_end:
-            game.Tick()
-            lps.reset()
-        if rps.is_end and game.NeedRender:
-            game.PaintOn(canvas)
-            render.Render(canvas)
-            rps.reset()
-            game.ClearDirty()
-finally:
-    render.Dispose()
+
+            now = now_seconds()
+            deadline = sched.tick_deadline()
+            for i in range(sched.due_ticks(now)):
+                if profiler.Enabled:
+                    profiler.OnTick(int((now - deadline - i * lps.time) * 1e9))
+                game.Tick()
+            if sched.frame_due(now) and (game.NeedRender or profiler.Enabled):
+                game.PaintOn(canvas)
+                if profiler.Enabled:
+                    profiler.OnFrame()
+                    profiler.PaintOn(canvas)
+                    profiler.MaybeDump()
+                render.Render(canvas)
+                sched.frame_done(now)
+                game.ClearDirty()
+
+    def RunAsync():
+        from AsyncRuntime import AsyncRuntime
+
+        AsyncRuntime(game, render, lambda: canvas, poll, OnKey, lps.time, rps.time,
+                     input_fd=input_fd, profiler=profiler).Run()
+
+    game.Initialize()
+    recorder = ReplayRecorder(game) if args.record else None
+    try:
+        if args.runtime == "async":
+            RunAsync()
+        else:
+            RunSync()
+    finally:
+        render.Dispose()
+        if recorder:
+            recorder.Save(args.record)
+        if args.profile_dump and profiler.WasEnabled and profiler.Samples:
+            profiler.Dump(args.profile_dump)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from time import time, sleep
+from time import time, sleep, perf_counter
 
 
 def now_milisecs() -> int:
@@ -6,7 +6,10 @@ def now_milisecs() -> int:
 
 
 def now_seconds() -> float:
-    return time()
+    """
+    Monotonic, only meant for measuring intervals.
+    """
+    return perf_counter()
 
 
 class timer:
@@ -41,3 +44,73 @@ class timer:
             return True
         else:
             return False
+
+
+class scheduler:
+    """
+    Tells the main loop when it has to wake up next instead of letting it spin.
+    Logic ticks run on a fixed timestep: their timer advances by whole intervals,
+    so missed ticks are caught up and the tick rate doesn't drift.
+    Frames are only worth waking up for when there's something to render.
+    """
+
+    def __init__(self, tick: timer, frame: timer, max_catch_up: int = 5):
+        """
+        :param max_catch_up: the most ticks run at once, further behind it resynchronizes instead
+        """
+        self.tick = tick
+        self.frame = frame
+        self.max_catch_up = max_catch_up
+
+    def reset(self):
+        self.tick.reset()
+        self.frame.reset()
+
+    def tick_deadline(self) -> float:
+        return self.tick.start_time + self.tick.time
+
+    def frame_deadline(self) -> float:
+        return self.frame.start_time + self.frame.time
+
+    def due_ticks(self, now: float) -> int:
+        """
+        Counts the ticks due by now and moves the tick deadline past them.
+        """
+        tick = self.tick
+        behind = now - tick.start_time
+        if behind < tick.time:
+            return 0
+        due = int(behind // tick.time)
+        if due > self.max_catch_up:
+            # Too far behind, run the capped batch now and the next tick an interval later.
+            tick.start_time = now
+            return self.max_catch_up
+        tick.start_time += due * tick.time
+        return due
+
+    def frame_due(self, now: float) -> bool:
+        return now >= self.frame_deadline()
+
+    def frame_done(self, now: float):
+        # Frames aren't caught up, the next one is simply due a frame later.
+        self.frame.start_time = now
+
+    def timeout(self, now: float, need_frame: bool) -> float:
+        deadline = self.tick_deadline()
+        if need_frame:
+            deadline = min(deadline, self.frame_deadline())
+        return max(0.0, deadline - now)
+
+    def wait(self, need_frame: bool, wait_input=None) -> bool:
+        """
+        Blocks until the next deadline or until there's input.
+        :param wait_input: (timeout) -> whether input arrived, it blocks at most `timeout` seconds
+        :return: whether input arrived
+        """
+        timeout = self.timeout(now_seconds(), need_frame)
+        if timeout <= 0:
+            return False
+        if wait_input:
+            return wait_input(timeout)
+        sleep(timeout)
+        return False